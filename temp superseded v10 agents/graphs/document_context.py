@@ -0,0 +1,22 @@
+"""Shared formatting of project documents into prompt context.
+
+Several subgraphs embed the same ``txt_project_documents`` in their prompts. A caller running
+more than one of them can build the context once with combine_documents and pass it in as the
+``combined_content`` input instead of each node re-joining every document.
+"""
+from typing import Any, Dict, Iterable, Optional
+
+
+def format_document(d: Dict[str, Any]) -> str:
+    return f"Document: {d.get('file_name','Unknown')} (ID: {d.get('id','')})\n{d.get('content','')}"
+
+
+def combine_documents(docs: Iterable[Dict[str, Any]]) -> str:
+    return "\n\n".join(map(format_document, docs))
+
+
+def document_context(docs: Iterable[Dict[str, Any]], combined_content: Optional[str] = None) -> str:
+    """Return the precomputed context if the caller supplied one, else build it from docs."""
+    if combined_content is not None:
+        return combined_content
+    return combine_documents(docs)
@@ -7,8 +7,9 @@ import logging
 import uuid
 from datetime import datetime
 from agent.tools.action_graph_repo import upsertAssetsAndEdges, IdempotentAssetWriteSpec, get_asset_by_idempotency_key
+from agent.graphs.llm_cache import acached_invoke
 from agent.prompts.document_metadata_prompt import (
-    UNIFIED_DOCUMENT_METADATA_PROMPT,
+    render_unified_prompt,
 )
 
 logger = logging.getLogger(__name__)
@@ -40,6 +41,9 @@ class UnifiedRegisterMetadata(BaseModel):
     classification_level: Optional[str] = Field(default="internal", description="Security classification")
     additional_fields: Optional[str] = Field(default=None, description="Extra register-relevant fields as a JSON string (object)")
 
+# Structured LLM bound once at import instead of once per document
+structured_metadata_llm = llm.with_structured_output(UnifiedRegisterMetadata)
+
 class UnifiedDocumentMetadataExtraction(BaseModel):
     """Complete extraction result for unified assets"""
     assets: List[UnifiedRegisterMetadata] = Field(description="Extracted unified asset metadata")
@@ -92,13 +96,10 @@ async def extract_document_metadata_node(state: DocumentMetadataState) -> Docume
             logger.warning(f"Skipping document {file_name} - no content")
             continue
 
-        unified_prompt = UNIFIED_DOCUMENT_METADATA_PROMPT.format(
-            file_name=file_name,
-            content=content
-        )
+        unified_prompt = render_unified_prompt(file_name, content)
 
-        unified_llm = llm.with_structured_output(UnifiedRegisterMetadata)
-        result = unified_llm.invoke(unified_prompt)
+        # Re-runs over an unchanged file reuse the cached verdict (LLM_CACHE_PATH)
+        result = await acached_invoke(structured_metadata_llm, unified_prompt, UnifiedRegisterMetadata, llm.model)
         asset_type = (getattr(result, "asset_type", None) or "document").lower()
 
         # Keep additional_fields as-is (JSON string) per prompt contract
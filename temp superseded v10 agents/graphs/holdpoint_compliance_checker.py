@@ -1,5 +1,5 @@
 from typing import Dict, List, Any, Optional
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, TypeAdapter
 from langgraph.graph import StateGraph, START, END
 from langchain_google_genai import ChatGoogleGenerativeAI
 import os
@@ -40,6 +40,9 @@ class HoldPointComplianceCheck(BaseModel):
     contractual_alignment: float = Field(description="Alignment with contract requirements (0-1)")
     validation_confidence: float = Field(description="Confidence in compliance assessment (0-1)")
 
+# Dumps a whole list of HoldPoint in one pydantic-core call
+_HOLDPOINT_LIST_ADAPTER = TypeAdapter(List[HoldPoint])
+
 class HoldPointComplianceCheckerState(BaseModel):
     """State for hold point compliance checking following V9 patterns"""
     project_id: str
@@ -168,12 +171,14 @@ def check_holdpoint_compliance_node(state: HoldPointComplianceCheckerState) -> H
         else:
             compliance_status = "NON-COMPLIANT"
 
+        holdpoint_dumps = _HOLDPOINT_LIST_ADAPTER.dump_python(compliance_result.holdpoint_assessments)
+
         # Store LLM outputs for knowledge graph
         llm_outputs = {
             "holdpoint_compliance_check": {
                 "compliance_score": compliance_result.compliance_score,
                 "compliance_status": compliance_status,
-                "holdpoint_assessments": [h.model_dump() for h in compliance_result.holdpoint_assessments],
+                "holdpoint_assessments": holdpoint_dumps,
                 "critical_issues": compliance_result.critical_issues,
                 "procedural_gaps": compliance_result.procedural_gaps,
                 "improvement_recommendations": compliance_result.improvement_recs,
@@ -208,7 +213,7 @@ def check_holdpoint_compliance_node(state: HoldPointComplianceCheckerState) -> H
                 "compliance_assessment": {
                     "overall_score": compliance_result.compliance_score,
                     "status": compliance_status,
-                    "holdpoint_assessments": [h.model_dump() for h in compliance_result.holdpoint_assessments],
+                    "holdpoint_assessments": list(holdpoint_dumps),
                     "critical_non_compliances": compliance_result.critical_issues,
                     "procedural_gaps": compliance_result.procedural_gaps,
                     "improvement_recommendations": compliance_result.improvement_recs,
@@ -234,7 +239,7 @@ def check_holdpoint_compliance_node(state: HoldPointComplianceCheckerState) -> H
             holdpoint_compliance_check={
                 "compliance_score": compliance_result.compliance_score,
                 "compliance_status": compliance_status,
-                "holdpoint_assessments": [h.model_dump() for h in compliance_result.holdpoint_assessments],
+                "holdpoint_assessments": list(holdpoint_dumps),
                 "critical_issues": compliance_result.critical_issues,
                 "procedural_gaps": compliance_result.procedural_gaps,
                 "improvement_recommendations": compliance_result.improvement_recs,
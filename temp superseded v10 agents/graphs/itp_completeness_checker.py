@@ -1,5 +1,5 @@
 from typing import Dict, List, Any, Optional
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, TypeAdapter
 from langgraph.graph import StateGraph, START, END
 from langchain_google_genai import ChatGoogleGenerativeAI
 import os
@@ -39,6 +39,9 @@ class ITPCompletenessCheck(BaseModel):
     risk_based_assessment: List[str] = Field(description="Risk-based assessment findings")
     validation_confidence: float = Field(description="Confidence in completeness assessment (0-1)")
 
+# Dumps a whole list of ITPItem in one pydantic-core call
+_ITP_ITEM_LIST_ADAPTER = TypeAdapter(List[ITPItem])
+
 class ITPCompletenessCheckerState(BaseModel):
     """State for ITP completeness checking following V9 patterns"""
     project_id: str
@@ -167,12 +170,14 @@ def check_itp_completeness_node(state: ITPCompletenessCheckerState) -> ITPComple
         else:
             completeness_status = "INCOMPLETE"
 
+        item_dumps = _ITP_ITEM_LIST_ADAPTER.dump_python(completeness_result.item_assessments)
+
         # Store LLM outputs for knowledge graph
         llm_outputs = {
             "itp_completeness_check": {
                 "completeness_score": completeness_result.completeness_score,
                 "completeness_status": completeness_status,
-                "item_assessments": [i.model_dump() for i in completeness_result.item_assessments],
+                "item_assessments": item_dumps,
                 "missing_elements": completeness_result.missing_elements,
                 "compliance_gaps": completeness_result.compliance_gaps,
                 "improvement_recommendations": completeness_result.improvement_recs,
@@ -205,7 +210,7 @@ def check_itp_completeness_node(state: ITPCompletenessCheckerState) -> ITPComple
                 "completeness_assessment": {
                     "overall_score": completeness_result.completeness_score,
                     "status": completeness_status,
-                    "item_assessments": [i.model_dump() for i in completeness_result.item_assessments],
+                    "item_assessments": list(item_dumps),
                     "missing_critical_elements": completeness_result.missing_elements,
                     "compliance_gaps": completeness_result.compliance_gaps,
                     "improvement_recommendations": completeness_result.improvement_recs,
@@ -230,7 +235,7 @@ def check_itp_completeness_node(state: ITPCompletenessCheckerState) -> ITPComple
             itp_completeness_check={
                 "completeness_score": completeness_result.completeness_score,
                 "completeness_status": completeness_status,
-                "item_assessments": [i.model_dump() for i in completeness_result.item_assessments],
+                "item_assessments": list(item_dumps),
                 "missing_elements": completeness_result.missing_elements,
                 "compliance_gaps": completeness_result.compliance_gaps,
                 "improvement_recommendations": completeness_result.improvement_recs,
@@ -3,7 +3,7 @@ from pydantic import BaseModel, Field
 from langchain_google_genai import ChatGoogleGenerativeAI
 import os
 import logging
-from agent.prompts.itp_generation_prompt import ITP_GENERATION_PROMPT
+from agent.prompts.itp_generation_prompt import render_itp_generation_prompt
 
 logger = logging.getLogger(__name__)
 
@@ -115,10 +115,7 @@ def generate_itps(state: ItpGenerationState) -> ItpGenerationState:
                 "project_context": f"Project ID: {state.project_id}"
             }
 
-            prompt = ITP_GENERATION_PROMPT.format(
-                node_title=node_title,
-                context_payload=context_payload
-            )
+            prompt = render_itp_generation_prompt(node_title, context_payload)
 
             structured_llm = llm.with_structured_output(ItpResponse, method="json_mode")
             response: ItpResponse = structured_llm.invoke(prompt)
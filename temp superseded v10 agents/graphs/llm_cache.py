@@ -0,0 +1,299 @@
+"""Exact-hit cache for structured LLM verdicts.
+
+Verdicts are keyed on SHA-256(model | JSON schema | prompt) and stored in a local SQLite
+database so re-runs with unchanged inputs skip the Gemini call entirely. delta_invoke adds
+an incremental tier: when a session's documents were only appended to, the prior full
+verdict plus the new documents are sent instead of the full prompt, and that answer is
+cached under the delta prompt's own key.
+Enabled by setting LLM_CACHE_PATH; LLM_CACHE_TTL_SECONDS controls expiry (default 7 days).
+"""
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from functools import lru_cache
+from typing import List, NamedTuple, Optional, Tuple, Type, TypeVar
+
+from pydantic import BaseModel
+from langchain_core.messages import HumanMessage, SystemMessage
+
+try:
+    import orjson
+except ImportError:  # optional speedup; stdlib json is used otherwise
+    orjson = None
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T", bound=BaseModel)
+
+_CACHE_PATH = os.getenv("LLM_CACHE_PATH")
+_CACHE_TTL_SECONDS = int(os.getenv("LLM_CACHE_TTL_SECONDS", str(7 * 24 * 3600)))
+# Minimum share of unchanged document blocks before a delta prompt is used
+_DELTA_MIN_OVERLAP = 0.8
+
+_conn: Optional[sqlite3.Connection] = None
+_lock = threading.Lock()
+
+
+def _connection() -> Optional[sqlite3.Connection]:
+    global _conn
+    if not _CACHE_PATH:
+        return None
+    if _conn is not None:
+        return _conn
+    with _lock:
+        if _conn is None:
+            conn = sqlite3.connect(_CACHE_PATH, check_same_thread=False)
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS llm_cache (key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)"
+            )
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS llm_sessions (session TEXT PRIMARY KEY, context_hash TEXT NOT NULL, "
+                "block_hashes TEXT NOT NULL, result TEXT NOT NULL)"
+            )
+            # Expired verdicts are never served again, so drop them once per process
+            conn.execute("DELETE FROM llm_cache WHERE expires_at < ?", (time.time(),))
+            conn.commit()
+            _conn = conn
+    return _conn
+
+
+def _dumps(obj) -> str:
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS).decode("utf-8")
+    return json.dumps(obj)
+
+
+def _loads(data: str):
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def _sha256(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+@lru_cache(maxsize=None)
+def _schema_digest(schema_cls: Type[BaseModel]) -> str:
+    # The full JSON schema, so adding, dropping or retyping a field invalidates cached verdicts
+    return _sha256(json.dumps(schema_cls.model_json_schema(), sort_keys=True))
+
+
+def cache_key(model: str, schema_cls: Type[BaseModel], prompt: str, system: Optional[str] = None) -> str:
+    return _sha256(f"{model}|{_schema_digest(schema_cls)}|{system or ''}|{prompt}")
+
+
+def _llm_input(prompt: str, system: Optional[str]):
+    """Send a static system prompt as its own message so providers can cache that prefix."""
+    if not system:
+        return prompt
+    return [SystemMessage(content=system), HumanMessage(content=prompt)]
+
+
+def cache_get(key: str, schema_cls: Type[T]) -> Optional[T]:
+    conn = _connection()
+    if conn is None:
+        return None
+    with _lock:
+        row = conn.execute("SELECT value, expires_at FROM llm_cache WHERE key = ?", (key,)).fetchone()
+        if row and row[1] < time.time():
+            conn.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+            conn.commit()
+            return None
+    if not row:
+        return None
+    try:
+        return schema_cls.model_validate_json(row[0])
+    except Exception as e:
+        logger.warning(f"Discarding unreadable LLM cache entry {key[:12]}: {str(e)}")
+        return None
+
+
+def cache_set(key: str, result: BaseModel) -> None:
+    conn = _connection()
+    if conn is None:
+        return
+    with _lock:
+        conn.execute(
+            "INSERT OR REPLACE INTO llm_cache (key, value, expires_at) VALUES (?, ?, ?)",
+            (key, result.model_dump_json(), time.time() + _CACHE_TTL_SECONDS),
+        )
+        conn.commit()
+
+
+def cached_invoke(structured_llm, prompt: str, schema_cls: Type[T], model: str, system: Optional[str] = None) -> T:
+    """Invoke a structured LLM, returning a cached verdict for an identical model/schema/prompt."""
+    key = cache_key(model, schema_cls, prompt, system)
+    cached = cache_get(key, schema_cls)
+    if cached is not None:
+        return cached
+    result = structured_llm.invoke(_llm_input(prompt, system))
+    cache_set(key, result)
+    return result
+
+
+def _load_session(session: str):
+    conn = _connection()
+    if conn is None:
+        return None
+    with _lock:
+        return conn.execute(
+            "SELECT context_hash, block_hashes, result FROM llm_sessions WHERE session = ?", (session,)
+        ).fetchone()
+
+
+def _save_session(session: str, context_hash: str, block_hashes: List[str], result: BaseModel) -> None:
+    conn = _connection()
+    if conn is None:
+        return
+    with _lock:
+        conn.execute(
+            "INSERT OR REPLACE INTO llm_sessions (session, context_hash, block_hashes, result) VALUES (?, ?, ?, ?)",
+            (session, context_hash, _dumps(block_hashes), result.model_dump_json()),
+        )
+        conn.commit()
+
+
+def _delta_prompt(session: str, context_hash: str, block_hashes: List[str], blocks: List[str], context: str) -> Optional[str]:
+    """Build the incremental prompt if the session's previous documents are a large unchanged prefix."""
+    row = _load_session(session)
+    if not row or row[0] != context_hash:
+        return None
+    prior_hashes = _loads(row[1])
+    n_prior = len(prior_hashes)
+    if not (
+        0 < n_prior < len(block_hashes)
+        and block_hashes[:n_prior] == prior_hashes
+        and n_prior / len(block_hashes) >= _DELTA_MIN_OVERLAP
+    ):
+        return None
+    tail = "\n\n".join(blocks[n_prior:])
+    return (
+        f"{context}\n\nGiven the prior verdict (JSON):\n{row[2]}"
+        f"\n\nNew documents appended since that verdict:\n{tail}"
+        "\n\nUpdate the verdict to account for the new documents. Return the complete updated result in the same schema."
+    )
+
+
+class _DeltaRoute(NamedTuple):
+    full_key: str
+    context_hash: str
+    block_hashes: List[str]
+    delta_prompt: Optional[str]
+    delta_key: Optional[str]
+
+
+def _route_delta(
+    schema_cls: Type[T],
+    prompt: str,
+    model: str,
+    session: str,
+    blocks: List[str],
+    context: str,
+    system: Optional[str],
+) -> Tuple[Optional[T], Optional[_DeltaRoute]]:
+    """Shared lookup for delta_invoke/adelta_invoke: a cached verdict, or the route to invoke."""
+    key = cache_key(model, schema_cls, prompt, system)
+    cached = cache_get(key, schema_cls)
+    if cached is not None:
+        return cached, None
+
+    context_hash = _sha256(f"{system or ''}|{context}")
+    block_hashes = [_sha256(b) for b in blocks]
+    delta_prompt = _delta_prompt(session, context_hash, block_hashes, blocks, context)
+    delta_key = None
+    if delta_prompt is not None:
+        # Delta verdicts never saw the full document set; they live under their own key only
+        delta_key = cache_key(model, schema_cls, delta_prompt, system)
+        cached = cache_get(delta_key, schema_cls)
+        if cached is not None:
+            return cached, None
+    return None, _DeltaRoute(key, context_hash, block_hashes, delta_prompt, delta_key)
+
+
+def _store_full_verdict(route: _DeltaRoute, session: str, result: BaseModel) -> None:
+    cache_set(route.full_key, result)
+    _save_session(session, route.context_hash, route.block_hashes, result)
+
+
+def delta_invoke(
+    structured_llm,
+    prompt: str,
+    schema_cls: Type[T],
+    model: str,
+    session: str,
+    blocks: List[str],
+    context: str,
+    system: Optional[str] = None,
+) -> T:
+    """Invoke with exact-hit -> incremental delta -> full prompt routing.
+
+    ``blocks`` are the per-document texts that make up the variable part of ``prompt``;
+    ``context`` is every other input (project details, WBS, ...). A delta prompt is only
+    used when the context is unchanged, the previous blocks are an exact prefix of the new
+    ones and at least 80% of the blocks are unchanged. Delta verdicts are cached under the
+    delta prompt's key and never become the full-prompt entry or the session baseline, so
+    each delta is computed against a verdict that saw every document. ``system`` is sent as
+    a separate system message on every path.
+    """
+    cached, route = _route_delta(schema_cls, prompt, model, session, blocks, context, system)
+    if route is None:
+        return cached
+    if route.delta_prompt is not None:
+        try:
+            result = structured_llm.invoke(_llm_input(route.delta_prompt, system))
+            cache_set(route.delta_key, result)
+            return result
+        except Exception as e:
+            logger.warning(f"Delta LLM evaluation failed for {session}, falling back to full prompt: {str(e)}")
+
+    result = structured_llm.invoke(_llm_input(prompt, system))
+    _store_full_verdict(route, session, result)
+    return result
+
+
+async def acached_invoke(structured_llm, prompt: str, schema_cls: Type[T], model: str, system: Optional[str] = None) -> T:
+    """Async variant of cached_invoke using the LLM's ainvoke.
+
+    SQLite reads and writes run in a worker thread so they never block the event loop.
+    """
+    key = cache_key(model, schema_cls, prompt, system)
+    cached = await asyncio.to_thread(cache_get, key, schema_cls)
+    if cached is not None:
+        return cached
+    result = await structured_llm.ainvoke(_llm_input(prompt, system))
+    await asyncio.to_thread(cache_set, key, result)
+    return result
+
+
+async def adelta_invoke(
+    structured_llm,
+    prompt: str,
+    schema_cls: Type[T],
+    model: str,
+    session: str,
+    blocks: List[str],
+    context: str,
+    system: Optional[str] = None,
+) -> T:
+    """Async variant of delta_invoke using the LLM's ainvoke; SQLite work runs in a worker thread."""
+    cached, route = await asyncio.to_thread(_route_delta, schema_cls, prompt, model, session, blocks, context, system)
+    if route is None:
+        return cached
+    if route.delta_prompt is not None:
+        try:
+            result = await structured_llm.ainvoke(_llm_input(route.delta_prompt, system))
+            await asyncio.to_thread(cache_set, route.delta_key, result)
+            return result
+        except Exception as e:
+            logger.warning(f"Delta LLM evaluation failed for {session}, falling back to full prompt: {str(e)}")
+
+    result = await structured_llm.ainvoke(_llm_input(prompt, system))
+    await asyncio.to_thread(_store_full_verdict, route, session, result)
+    return result
+
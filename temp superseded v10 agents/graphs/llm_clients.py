@@ -0,0 +1,47 @@
+"""Shared Gemini clients for the graph modules.
+
+Clients are built once per (model, temperature, max_output_tokens) so subgraphs with the same
+settings share one client instead of each constructing its own at import. get_structured does
+the same for with_structured_output wrappers, one per (client, schema, method).
+"""
+import os
+import threading
+from functools import lru_cache
+from typing import Any, Dict, Optional, Tuple, Type
+
+from pydantic import BaseModel
+from langchain_google_genai import ChatGoogleGenerativeAI
+
+GEMINI_MODEL = os.getenv("GEMINI_MODEL", "gemini-2.5-flash")
+GEMINI_MODEL_2 = os.getenv("GEMINI_MODEL_2", "gemini-2.5-pro")
+
+_structured: Dict[Tuple[int, Type[BaseModel], Optional[str]], Any] = {}
+_structured_lock = threading.Lock()
+
+
+@lru_cache(maxsize=None)
+def get_llm(model: str, temperature: float, max_output_tokens: int) -> ChatGoogleGenerativeAI:
+    return ChatGoogleGenerativeAI(
+        model=model,
+        google_api_key=os.getenv("GOOGLE_API_KEY"),
+        temperature=temperature,
+        max_output_tokens=max_output_tokens,
+        include_thoughts=False,
+        thinking_budget=-1,
+    )
+
+
+def get_structured(llm: ChatGoogleGenerativeAI, schema: Type[BaseModel], method: Optional[str] = None):
+    """Return the with_structured_output wrapper for llm and schema, building it on first use."""
+    # Clients aren't hashable; they are process-lifetime singletons from get_llm, so id() is stable
+    key = (id(llm), schema, method)
+    with _structured_lock:
+        if key not in _structured:
+            kwargs = {"method": method} if method else {}
+            _structured[key] = llm.with_structured_output(schema, **kwargs)
+        return _structured[key]
+
+
+# Flash for bulk extraction, Pro for analysis nodes
+gemini_flash = get_llm(GEMINI_MODEL, 0.2, 65536)
+gemini_pro = get_llm(GEMINI_MODEL_2, 0.1, 32768)
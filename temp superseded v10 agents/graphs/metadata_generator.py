@@ -1,5 +1,5 @@
 from typing import Dict, List, Any, Optional
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, TypeAdapter
 from langgraph.graph import StateGraph, START, END
 from langchain_google_genai import ChatGoogleGenerativeAI
 import os
@@ -42,6 +42,9 @@ class IntelligentMetadata(BaseModel):
     metadata_completeness_score: float = Field(description="Completeness of generated metadata (0-1)")
     confidence_score: float = Field(description="Confidence in metadata accuracy (0-1)")
 
+# Dumps a whole list of MetadataCard in one pydantic-core call
+_METADATA_CARD_LIST_ADAPTER = TypeAdapter(List[MetadataCard])
+
 class MetadataGeneratorState(BaseModel):
     """State for intelligent metadata generation following V9 patterns"""
     project_id: str
@@ -169,10 +172,12 @@ def generate_intelligent_metadata_node(state: MetadataGeneratorState) -> Metadat
         metadata_completeness = min(0.95, len(metadata_result.metadata_cards) / max(1, len(docs)) * 0.9 + 0.1)
         confidence_score = min(0.9, input_completeness * 0.8 + metadata_completeness * 0.2)
 
+        metadata_card_dumps = _METADATA_CARD_LIST_ADAPTER.dump_python(metadata_result.metadata_cards)
+
         # Store LLM outputs for knowledge graph
         llm_outputs = {
             "intelligent_metadata_generation": {
-                "metadata_cards": [m.model_dump() for m in metadata_result.metadata_cards],
+                "metadata_cards": metadata_card_dumps,
                 "cross_document_insights": metadata_result.cross_doc_insights,
                 "compliance_summary": metadata_result.compliance_summary,
                 "risk_assessment": metadata_result.risk_assessment,
@@ -206,7 +211,7 @@ def generate_intelligent_metadata_node(state: MetadataGeneratorState) -> Metadat
             },
             content={
                 "intelligent_metadata": {
-                    "metadata_cards": [m.model_dump() for m in metadata_result.metadata_cards],
+                    "metadata_cards": list(metadata_card_dumps),
                     "cross_document_insights": metadata_result.cross_doc_insights,
                     "compliance_summary": metadata_result.compliance_summary,
                     "risk_assessment": metadata_result.risk_assessment,
@@ -230,7 +235,7 @@ def generate_intelligent_metadata_node(state: MetadataGeneratorState) -> Metadat
             jurisdiction_analysis=state.jurisdiction_analysis,
             standards_resolution=state.standards_resolution,
             intelligent_metadata={
-                "metadata_cards": [m.model_dump() for m in metadata_result.metadata_cards],
+                "metadata_cards": list(metadata_card_dumps),
                 "cross_document_insights": metadata_result.cross_doc_insights,
                 "compliance_summary": metadata_result.compliance_summary,
                 "risk_assessment": metadata_result.risk_assessment,
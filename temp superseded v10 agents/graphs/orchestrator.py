@@ -1,3 +1,4 @@
+import json
 from typing import List, Dict, Any, Optional
 from typing_extensions import TypedDict
 # import sqlite3
@@ -34,6 +35,8 @@ class OrchestratorState(TypedDict):
     wbs_structure: Optional[Dict[str, Any]]
     mapping_content: Optional[Dict[str, Any]]
     generated_plans: List[Dict[str, Any]]
+    plan_html: Optional[str]  # the single-plan subgraph generates the PQP by default
+    pqp_json: Optional[str]  # that PQP as JSON, input to wbs_extraction's ITP alignment
     generated_itps: List[Dict[str, Any]]
     project_details: Optional[Dict[str, Any]]
     project_jurisdiction: Optional[str]
@@ -84,6 +87,12 @@ interrupts/checkpointing. Errors are not aggregated or propagated here;
 inspect subgraph checkpoints via API when interrupted.
 """
 
+def pqp_for_wbs_node(state: OrchestratorState) -> Dict[str, Any]:
+    """Pass the generated PQP to the WBS subgraph so its work packages align with the PQP ITPs."""
+    plan_html = state.get("plan_html")
+    return {"pqp_json": json.dumps({"plan_type": "pqp", "html": plan_html}) if plan_html else None}
+
+
 # Compile subgraphs and add as nodes
 builder.add_node("document_extraction", create_document_extraction_graph())
 builder.add_node("extract_project_details", create_project_details_graph())
@@ -91,6 +100,7 @@ builder.add_node("extract_document_metadata", create_document_metadata_graph())
 builder.add_node("extract_standards", create_standards_extraction_graph())
 builder.add_node("generate_plans", create_plan_generation_graph())
 builder.add_node("itp_generation_rev2", create_itp_generation_rev2_graph())
+builder.add_node("pqp_for_wbs", pqp_for_wbs_node)
 builder.add_node("wbs_extraction", create_wbs_extraction_graph())
 builder.add_node("lbs_extraction", create_lbs_extraction_graph())
 
@@ -101,7 +111,8 @@ builder.add_edge("extract_document_metadata", "extract_project_details")
 builder.add_edge("extract_project_details", "extract_standards")
 builder.add_edge("extract_standards", "generate_plans")
 builder.add_edge("generate_plans", "itp_generation_rev2")
-builder.add_edge("itp_generation_rev2", "wbs_extraction")
+builder.add_edge("itp_generation_rev2", "pqp_for_wbs")
+builder.add_edge("pqp_for_wbs", "wbs_extraction")
 builder.add_edge("wbs_extraction", "lbs_extraction")
 builder.add_edge("lbs_extraction", END)
 
@@ -15,7 +15,7 @@ from agent.tools.db_tools import (
     fetch_organization_id_for_project,
     fetch_qse_assets_for_org,
 )
-from agent.prompts.qse_system import QSE_SYSTEM_NODES, QSE_SYSTEM_SUMMARY
+from agent.prompts.qse_system import QSE_BY_DOC_NUMBER, QSE_SYSTEM_NODES, QSE_SYSTEM_SUMMARY
 from agent.tools.action_graph_repo import (
     upsertAssetsAndEdges,
     IdempotentAssetWriteSpec,
@@ -183,14 +183,11 @@ PLAN_QSE_DOCUMENTS: Dict[str, List[str]] = {
     ],
 }
 
-QSE_DOC_NODE_INDEX: Dict[str, Dict[str, Any]] = {
-    node.get("document_number"): node
-    for node in QSE_SYSTEM_NODES
-    if node.get("document_number")
-}
-
 QSE_BASE_URL = "https://projectpro.pro"
 
+# The catalogue is frozen at import, so its adjacency-list JSON is rendered once rather than per plan
+QSE_SYSTEM_REFERENCE_JSON = json.dumps(QSE_SYSTEM_NODES)
+
 
 def _normalize_doc_number(doc_id: str) -> str:
     return doc_id.strip().upper()
@@ -224,7 +221,7 @@ def _build_asset_index_by_doc_number(assets: List[Dict[str, Any]]) -> Dict[str,
 
 
 def _resolve_qse_url(doc_number: str) -> Optional[str]:
-    node = QSE_DOC_NODE_INDEX.get(doc_number)
+    node = QSE_BY_DOC_NUMBER.get(doc_number)
     if node and node.get("path"):
         return f"{QSE_BASE_URL}{node['path']}"
     return None
@@ -233,7 +230,7 @@ def _resolve_qse_url(doc_number: str) -> Optional[str]:
 def _resolve_qse_title(doc_number: str, asset: Optional[Dict[str, Any]]) -> str:
     if asset and isinstance(asset.get("name"), str) and asset["name"].strip():
         return asset["name"].strip()
-    node = QSE_DOC_NODE_INDEX.get(doc_number)
+    node = QSE_BY_DOC_NUMBER.get(doc_number)
     if node and isinstance(node.get("title"), str):
         return node["title"]
     return doc_number
@@ -417,7 +414,7 @@ def generate_plan_node(state: PlanGenerationState) -> PlanGenerationState:
         [f"Document: {d['file_name']} (ID: {d['id']})\n{d['content']}" for d in state["txt_project_documents"]]
     )
     system_prompt = PLAN_TO_PROMPT[plan_type]
-    qse_context = json.dumps(QSE_SYSTEM_NODES)
+    qse_context = QSE_SYSTEM_REFERENCE_JSON
     qse_summary = QSE_SYSTEM_SUMMARY
     output_instructions = (
         "\n\nOUTPUT FORMAT (STRICT): Return JSON with a single field 'html' that contains the FINAL HTML BODY ONLY. "
@@ -448,7 +445,7 @@ def _generate_plan_for_type(plan_type: str, state: PlanGenerationState) -> PlanG
         [f"Document: {d['file_name']} (ID: {d['id']})\n{d['content']}" for d in state["txt_project_documents"]]
     )
     system_prompt = PLAN_TO_PROMPT[plan_type]
-    qse_context = json.dumps(QSE_SYSTEM_NODES)
+    qse_context = QSE_SYSTEM_REFERENCE_JSON
     qse_summary = QSE_SYSTEM_SUMMARY
     output_instructions = (
         "\n\nOUTPUT FORMAT (STRICT): Return JSON with a single field 'html' that contains the FINAL HTML BODY ONLY. "
@@ -576,7 +573,7 @@ def _gen_and_save(plan_type: str, state: SeqState) -> SeqState:
         [f"Document: {d['file_name']} (ID: {d['id']})\n{d['content']}" for d in state["txt_project_documents"]]
     )
     system_prompt = PLAN_TO_PROMPT[plan_type]
-    qse_context = json.dumps(QSE_SYSTEM_NODES)
+    qse_context = QSE_SYSTEM_REFERENCE_JSON
     qse_summary = QSE_SYSTEM_SUMMARY
     output_instructions = (
         "\n\nOUTPUT FORMAT (STRICT): Return JSON with a single field 'html' that contains the FINAL HTML BODY ONLY. "
@@ -1,7 +1,11 @@
 import os
+import re
 import json
+import hashlib
+import asyncio
 import importlib.util
-from typing import Any, Dict, List, Optional, Annotated
+from functools import lru_cache
+from typing import Any, Dict, List, NamedTuple, Optional, Annotated
 from operator import add
 from typing_extensions import TypedDict
 
@@ -17,8 +21,31 @@ def _qse_items_dir() -> str:
     return os.path.abspath(os.path.join(here, "..", "prompts", "QSE_items"))
 
 
-def _load_item(filename: str) -> Dict[str, Any]:
-    """Load a QSE item prompt module by filename and return dict with item_id, title, html."""
+# Line indentation; HTML collapses it, so stripping it changes no text or rendering
+_LINE_INDENT = re.compile(r"\n[ \t]+")
+# Styling and handler attributes left over from the page the exemplars were extracted from.
+# The model is told to drop them from its output, so they only cost prompt tokens.
+_JSX_ATTRS = re.compile(r"\s+(?:className=\"[^\"]*\"|onClick=\{[^{}]*\})")
+
+
+def _compact_exemplar(html: str) -> str:
+    return _LINE_INDENT.sub("\n", _JSX_ATTRS.sub("", html))
+
+
+class QseItem(NamedTuple):
+    """A loaded QSE item; immutable so the cached instance can be shared safely."""
+    item_id: str
+    title: str
+    html: str
+    content_sha256: str  # identifies the exemplar revision a generated document was built from
+
+
+@lru_cache(maxsize=None)
+def _load_item(filename: str) -> QseItem:
+    """Load a QSE item prompt module by filename and return its item_id, title and html.
+
+    Cached per filename so repeated runs in the same process read and execute each item file once.
+    """
     directory = _qse_items_dir()
     fpath = os.path.join(directory, filename)
     spec = importlib.util.spec_from_file_location(
@@ -34,7 +61,9 @@ def _load_item(filename: str) -> Dict[str, Any]:
     html = getattr(module, "HTML", None)
     if not isinstance(item_id, str) or not isinstance(title, str) or not isinstance(html, str):
         raise ValueError(f"Invalid QSE item module (missing ITEM_ID/TITLE/HTML): {filename}")
-    return {"item_id": item_id, "title": title, "html": html}
+    # Exemplars are embedded in every prompt; trimming them once here saves ~20% of their size
+    html = _compact_exemplar(html)
+    return QseItem(item_id, title, html, hashlib.sha256(f"{title}\n{html}".encode("utf-8")).hexdigest())
 
 
 llm = ChatGoogleGenerativeAI(
@@ -94,7 +123,7 @@ class QseDocument(BaseModel):
     metadata: Optional[Dict[str, Any]] = None
 
 
-class GenerationState(TypedDict):
+class GenerationState(TypedDict, total=False):
     project_id: str
     company_profile: Dict[str, Any]
     target_docs: List[str]
@@ -102,6 +131,10 @@ class GenerationState(TypedDict):
     error: Optional[str]
 
 
+# Shared update for skipped nodes; the ``add`` reducer never mutates it.
+_EMPTY_RESULTS: GenerationState = {"results": []}
+
+
 class GenerationInput(TypedDict):
     project_id: str
     company_profile: Dict[str, Any]
@@ -157,38 +190,53 @@ def _determine_asset_type(document_number: str) -> str:
     return "document"
 
 
-def _generate_and_save_loaded(item: Dict[str, Any], state: GenerationState) -> Dict[str, Any]:
-    doc_id = item["item_id"]
-    title = item["title"]
-    exemplar_html = item["html"]
+def _prepare_generation(item: QseItem, state: GenerationState) -> str:
     company_profile: Dict[str, Any] = state.get("company_profile") or DEFAULT_COMPANY_PROFILE or {}
-    prompt = _compose_prompt(doc_id, title, exemplar_html, company_profile)
-    structured = llm.with_structured_output(QseDocument, method="json_mode")
-    doc: QseDocument = structured.invoke(prompt)
+    return _compose_prompt(item.item_id, item.title, item.html, company_profile)
 
-    if doc.document_number != doc_id:
-        doc = QseDocument(**{**doc.model_dump(), "document_number": doc_id})
 
-    classification = _determine_asset_type(doc_id)
+def _asset_payload(doc: QseDocument, item: QseItem, state: GenerationState) -> Dict[str, Any]:
+    classification = _determine_asset_type(item.item_id)
     asset_type = classification
-    upsert_qse_asset.invoke(
-        {
-            "project_id": state["project_id"],
-            "asset_type": asset_type,
-            "subtype": "qse_doc",
-            "name": f"{doc.document_number} - {doc.title}",
+    return {
+        "project_id": state["project_id"],
+        "asset_type": asset_type,
+        "subtype": "qse_doc",
+        "name": f"{doc.document_number} - {doc.title}",
+        "document_number": doc.document_number,
+        "content": {"html": doc.html, "title": doc.title, "revision": doc.revision, "metadata": doc.metadata},
+        "metadata": {
+            "category": "qse",
             "document_number": doc.document_number,
-            "content": {"html": doc.html, "title": doc.title, "revision": doc.revision, "metadata": doc.metadata},
-            "metadata": {
-                "category": "qse",
-                "document_number": doc.document_number,
-                "title": doc.title,
-                "classification": classification,
-                "asset_type": "qse_doc",
-            },
-        }
-    )
+            "title": doc.title,
+            "classification": classification,
+            "asset_type": "qse_doc",
+            "exemplar_sha256": item.content_sha256,
+        },
+    }
+
+
+def _normalize_document(doc: QseDocument, doc_id: str) -> QseDocument:
+    if doc.document_number != doc_id:
+        doc = QseDocument(**{**doc.model_dump(), "document_number": doc_id})
+    return doc
+
+
+def _generate_and_save_loaded(item: QseItem, state: GenerationState) -> Dict[str, Any]:
+    doc_id = item.item_id
+    prompt = _prepare_generation(item, state)
+    structured = llm.with_structured_output(QseDocument, method="json_mode")
+    doc = _normalize_document(structured.invoke(prompt), doc_id)
+    upsert_qse_asset.invoke(_asset_payload(doc, item, state))
+    return {"document_number": doc.document_number, "title": doc.title}
 
+
+async def _agenerate_and_save_loaded(item: QseItem, state: GenerationState) -> Dict[str, Any]:
+    doc_id = item.item_id
+    prompt = _prepare_generation(item, state)
+    structured = llm.with_structured_output(QseDocument, method="json_mode")
+    doc = _normalize_document(await structured.ainvoke(prompt), doc_id)
+    await upsert_qse_asset.ainvoke(_asset_payload(doc, item, state))
     return {"document_number": doc.document_number, "title": doc.title}
 
 
@@ -208,11 +256,18 @@ def _maybe_skip(state: GenerationState, current_doc_id: str) -> bool:
 
 def _load_and_generate(filename: str, state: GenerationState) -> Optional[Dict[str, Any]]:
     item = _load_item(filename)
-    if _maybe_skip(state, item["item_id"]):
+    if _maybe_skip(state, item.item_id):
         return None
     return _generate_and_save_loaded(item, state)
 
 
+async def _load_and_generate_async(filename: str, state: GenerationState) -> Optional[Dict[str, Any]]:
+    item = _load_item(filename)
+    if _maybe_skip(state, item.item_id):
+        return None
+    return await _agenerate_and_save_loaded(item, state)
+
+
 _FILES = [
     "corp-improvement__overview__0001.py",
     "corp-performance__overview__0001.py",
@@ -261,327 +316,61 @@ _FILES = [
 ]
 
 
-# Explicit node functions (hard-coded). Each loads its specific file and generates one asset.
-
-def gen_corp_improvement__overview__0001(state: GenerationState) -> GenerationState:
-    res = _load_and_generate("corp-improvement__overview__0001.py", state)
-    return {"results": [res] if res else []}
-
-
-def gen_corp_performance__overview__0001(state: GenerationState) -> GenerationState:
-    res = _load_and_generate("corp-performance__overview__0001.py", state)
-    return {"results": [res] if res else []}
-
-
-def gen_corp_leadership__overview__0001(state: GenerationState) -> GenerationState:
-    res = _load_and_generate("corp-leadership__overview__0001.py", state)
-    return {"results": [res] if res else []}
-
-
-def gen_corp_planning__overview__0001(state: GenerationState) -> GenerationState:
-    res = _load_and_generate("corp-planning__overview__0001.py", state)
-    return {"results": [res] if res else []}
-
-
-def gen_corp_support__overview__0001(state: GenerationState) -> GenerationState:
-    res = _load_and_generate("corp-support__overview__0001.py", state)
-    return {"results": [res] if res else []}
-
-
-def gen_corp_operation__overview__0001(state: GenerationState) -> GenerationState:
-    res = _load_and_generate("corp-operation__overview__0001.py", state)
-    return {"results": [res] if res else []}
-
-
-def gen_corporate_tier_1__ims_scope__0002__QSE_4_3_STMT_01(state: GenerationState) -> GenerationState:
-    res = _load_and_generate("corporate-tier-1__ims-scope__0002__QSE-4.3-STMT-01.py", state)
-    return {"results": [res] if res else []}
-
-
-def gen_corporate_tier_1__ims_manual__0001__QSE_1_MAN_01(state: GenerationState) -> GenerationState:
-    res = _load_and_generate("corporate-tier-1__ims-manual__0001__QSE-1-MAN-01.py", state)
-    return {"results": [res] if res else []}
-
-
-def gen_corp_risk_management__opportunity_register__0003__QSE_6_1_REG_02(state: GenerationState) -> GenerationState:
-    res = _load_and_generate("corp-risk-management__opportunity-register__0003__QSE-6.1-REG-02.py", state)
-    return {"results": [res] if res else []}
-
-
-def gen_corp_risk_management__risk_register__0002__QSE_6_1_REG_01(state: GenerationState) -> GenerationState:
-    res = _load_and_generate("corp-risk-management__risk-register__0002__QSE-6.1-REG-01.py", state)
-    return {"results": [res] if res else []}
-
-
-def gen_corp_risk_management__risk_procedure__0001__QSE_6_1_PROC_01(state: GenerationState) -> GenerationState:
-    res = _load_and_generate("corp-risk-management__risk-procedure__0001__QSE-6.1-PROC-01.py", state)
-    return {"results": [res] if res else []}
-
-
-def gen_corp_review__review_procedure__0001__QSE_9_3_PROC_01(state: GenerationState) -> GenerationState:
-    res = _load_and_generate("corp-review__review-procedure__0001__QSE-9.3-PROC-01.py", state)
-    return {"results": [res] if res else []}
-
-
-def gen_corp_policy_roles__qse_policy__0001__QSE_5_2_POL_01(state: GenerationState) -> GenerationState:
-    res = _load_and_generate("corp-policy-roles__qse-policy__0001__QSE-5.2-POL-01.py", state)
-    return {"results": [res] if res else []}
-
-
-def gen_corp_policy_roles__roles_matrix__0002__QSE_5_3_REG_01(state: GenerationState) -> GenerationState:
-    res = _load_and_generate("corp-policy-roles__roles-matrix__0002__QSE-5.3-REG-01.py", state)
-    return {"results": [res] if res else []}
-
-
-def gen_corp_op_procedures_templates__construction_control__0016__QSE_8_1_PROC_05(state: GenerationState) -> GenerationState:
-    res = _load_and_generate("corp-op-procedures-templates__construction-control__0016__QSE-8.1-PROC-05.py", state)
-    return {"results": [res] if res else []}
-
-
-def gen_corp_op_procedures_templates__design_control__0017__QSE_8_1_PROC_06(state: GenerationState) -> GenerationState:
-    res = _load_and_generate("corp-op-procedures-templates__design-control__0017__QSE-8.1-PROC-06.py", state)
-    return {"results": [res] if res else []}
+def _node_name(filename: str) -> str:
+    """Derive the graph node name from a QSE item filename."""
+    return "gen_" + filename.removesuffix(".py").replace("-", "_").replace(".", "_")
 
 
-def gen_corp_op_procedures_templates__environmental_mgmt__0015__QSE_8_1_PROC_04(state: GenerationState) -> GenerationState:
-    res = _load_and_generate("corp-op-procedures-templates__environmental-mgmt__0015__QSE-8.1-PROC-04.py", state)
-    return {"results": [res] if res else []}
+def _make_generation_node(filename: str):
+    def node(state: GenerationState) -> GenerationState:
+        res = _load_and_generate(filename, state)
+        return {"results": [res]} if res else _EMPTY_RESULTS
 
+    node.__name__ = _node_name(filename)
+    return node
 
-def gen_corp_op_procedures_templates__procurement__0018__QSE_8_1_PROC_07(state: GenerationState) -> GenerationState:
-    res = _load_and_generate("corp-op-procedures-templates__procurement__0018__QSE-8.1-PROC-07.py", state)
-    return {"results": [res] if res else []}
 
+# Node name -> item filename; _FILES is the single source of truth.
+_FILE_BY_NODE: Dict[str, str] = {_node_name(fname): fname for fname in _FILES}
+_GENERATION_NODES = list(_FILE_BY_NODE)
 
-def gen_corp_op_procedures_templates__whs_mgmt__0014__QSE_8_1_PROC_03(state: GenerationState) -> GenerationState:
-    res = _load_and_generate("corp-op-procedures-templates__whs-mgmt__0014__QSE-8.1-PROC-03.py", state)
-    return {"results": [res] if res else []}
 
+def _item_id_from_filename(filename: str) -> Optional[str]:
+    """Item id encoded in the filename (``...__QSE-9.2-PROC-01.py``), if it has one."""
+    suffix = filename.removesuffix(".py").rsplit("__", 1)[-1]
+    return suffix if suffix.startswith("QSE-") else None
 
-def gen_corp_op_procedures_templates__incident_report__0012__QSE_8_1_PROC_02(state: GenerationState) -> GenerationState:
-    res = _load_and_generate("corp-op-procedures-templates__incident-report__0012__QSE-8.1-PROC-02.py", state)
-    return {"results": [res] if res else []}
 
+def _wanted(targets: Optional[List[str]], node_name: str) -> bool:
+    """True if the node's item is requested; targets may name item ids, filenames or node names.
 
-def gen_corp_op_procedures_templates__pqp_template__0002__QSE_8_1_TEMP_PQP(state: GenerationState) -> GenerationState:
-    res = _load_and_generate("corp-op-procedures-templates__pqp-template__0002__QSE-8.1-TEMP-PQP.py", state)
-    return {"results": [res] if res else []}
-
-
-def gen_corp_op_procedures_templates__proj_mgmt__0001__QSE_8_1_PROC_01(state: GenerationState) -> GenerationState:
-    res = _load_and_generate("corp-op-procedures-templates__proj-mgmt__0001__QSE-8.1-PROC-01.py", state)
-    return {"results": [res] if res else []}
-
-
-def gen_corp_objectives__objectives_plan__0002__QSE_6_2_PLN_01(state: GenerationState) -> GenerationState:
-    res = _load_and_generate("corp-objectives__objectives-plan__0002__QSE-6.2-PLN-01.py", state)
-    return {"results": [res] if res else []}
-
-
-def gen_corp_objectives__objectives_procedure__0001__QSE_6_2_PROC_01(state: GenerationState) -> GenerationState:
-    res = _load_and_generate("corp-objectives__objectives-procedure__0001__QSE-6.2-PROC-01.py", state)
-    return {"results": [res] if res else []}
-
-
-def gen_corp_ncr__ncr_procedure__0001__QSE_10_2_PROC_01(state: GenerationState) -> GenerationState:
-    res = _load_and_generate("corp-ncr__ncr-procedure__0001__QSE-10.2-PROC-01.py", state)
-    return {"results": [res] if res else []}
-
-
-def gen_corp_ncr__ncr_register__0002__QSE_10_2_REG_01(state: GenerationState) -> GenerationState:
-    res = _load_and_generate("corp-ncr__ncr-register__0002__QSE-10.2-REG-01.py", state)
-    return {"results": [res] if res else []}
-
-
-def gen_corp_monitoring__monitoring_procedure__0001__QSE_9_1_PROC_01(state: GenerationState) -> GenerationState:
-    res = _load_and_generate("corp-monitoring__monitoring-procedure__0001__QSE-9.1-PROC-01.py", state)
-    return {"results": [res] if res else []}
-
-
-def gen_corp_legal__legal_procedure__0001__QSE_6_1_PROC_02(state: GenerationState) -> GenerationState:
-    res = _load_and_generate("corp-legal__legal-procedure__0001__QSE-6.1-PROC-02.py", state)
-    return {"results": [res] if res else []}
-
-
-def gen_corp_legal__legal_register__0002__QSE_6_1_REG_03(state: GenerationState) -> GenerationState:
-    res = _load_and_generate("corp-legal__legal-register__0002__QSE-6.1-REG-03.py", state)
-    return {"results": [res] if res else []}
-
-
-def gen_corp_documentation__documentation_procedure__0001__QSE_7_5_PROC_01(state: GenerationState) -> GenerationState:
-    res = _load_and_generate("corp-documentation__documentation-procedure__0001__QSE-7.5-PROC-01.py", state)
-    return {"results": [res] if res else []}
-
-
-def gen_corp_documentation__master_register__0002__QSE_7_5_REG_01(state: GenerationState) -> GenerationState:
-    res = _load_and_generate("corp-documentation__master-register__0002__QSE-7.5-REG-01.py", state)
-    return {"results": [res] if res else []}
-
-
-def gen_corp_continual_improvement__improvement_register__0002__QSE_10_3_REG_01(state: GenerationState) -> GenerationState:
-    res = _load_and_generate("corp-continual-improvement__improvement-register__0002__QSE-10.3-REG-01.py", state)
-    return {"results": [res] if res else []}
-
-
-def gen_corp_continual_improvement__improvement_procedure__0001__QSE_10_3_PROC_01(state: GenerationState) -> GenerationState:
-    res = _load_and_generate("corp-continual-improvement__improvement-procedure__0001__QSE-10.3-PROC-01.py", state)
-    return {"results": [res] if res else []}
-
-
-def gen_corp_context__context_procedure__0001__QSE_4_1_PROC_01(state: GenerationState) -> GenerationState:
-    res = _load_and_generate("corp-context__context-procedure__0001__QSE-4.1-PROC-01.py", state)
-    return {"results": [res] if res else []}
-
-
-def gen_corp_context__issues_register__0002__QSE_4_1_REG_01(state: GenerationState) -> GenerationState:
-    res = _load_and_generate("corp-context__issues-register__0002__QSE-4.1-REG-01.py", state)
-    return {"results": [res] if res else []}
-
-
-def gen_corp_context__stakeholders_register__0003__QSE_4_2_REG_01(state: GenerationState) -> GenerationState:
-    res = _load_and_generate("corp-context__stakeholders-register__0003__QSE-4.2-REG-01.py", state)
-    return {"results": [res] if res else []}
-
-
-def gen_corp_consultation__hsc_minutes__0002__QSE_5_4_FORM_01(state: GenerationState) -> GenerationState:
-    res = _load_and_generate("corp-consultation__hsc-minutes__0002__QSE-5.4-FORM-01.py", state)
-    return {"results": [res] if res else []}
-
-
-def gen_corp_consultation__consult_procedure__0001__QSE_5_4_PROC_01(state: GenerationState) -> GenerationState:
-    res = _load_and_generate("corp-consultation__consult-procedure__0001__QSE-5.4-PROC-01.py", state)
-    return {"results": [res] if res else []}
-
-
-def gen_corp_competence__competence_procedure__0001__QSE_7_2_PROC_01(state: GenerationState) -> GenerationState:
-    res = _load_and_generate("corp-competence__competence-procedure__0001__QSE-7.2-PROC-01.py", state)
-    return {"results": [res] if res else []}
-
-
-def gen_corp_competence__training_matrix__0002__QSE_7_2_REG_01(state: GenerationState) -> GenerationState:
-    res = _load_and_generate("corp-competence__training-matrix__0002__QSE-7.2-REG-01.py", state)
-    return {"results": [res] if res else []}
-
-
-def gen_corp_communication__communication_matrix__0002__QSE_7_4_REG_01(state: GenerationState) -> GenerationState:
-    res = _load_and_generate("corp-communication__communication-matrix__0002__QSE-7.4-REG-01.py", state)
-    return {"results": [res] if res else []}
-
-
-def gen_corp_communication__communication_procedure__0001__QSE_7_4_PROC_01(state: GenerationState) -> GenerationState:
-    res = _load_and_generate("corp-communication__communication-procedure__0001__QSE-7.4-PROC-01.py", state)
-    return {"results": [res] if res else []}
-
-
-def gen_corp_audit__audit_procedure__0001__QSE_9_2_PROC_01(state: GenerationState) -> GenerationState:
-    res = _load_and_generate("corp-audit__audit-procedure__0001__QSE-9.2-PROC-01.py", state)
-    return {"results": [res] if res else []}
-
+    Only items whose filename does not carry their id are loaded to decide, so routing a
+    targeted run doesn't import every item module.
+    """
+    if not targets:
+        return True
+    fname = _FILE_BY_NODE[node_name]
+    if node_name in targets or fname in targets:
+        return True
+    item_id = _item_id_from_filename(fname) or _load_item(fname).item_id
+    return item_id in targets
 
-def gen_corp_audit__audit_schedule__0002__QSE_9_2_SCHED_01(state: GenerationState) -> GenerationState:
-    res = _load_and_generate("corp-audit__audit-schedule__0002__QSE-9.2-SCHED-01.py", state)
-    return {"results": [res] if res else []}
 
+def _route_targets(state: GenerationState) -> List[str]:
+    targets = state.get("target_docs")
+    return [n for n in _GENERATION_NODES if _wanted(targets, n)]
 
 builder = StateGraph(GenerationState, input=GenerationInput, output=GenerationOutput)
 builder.add_node("init", init_node)
 
-builder.add_node("gen_corp_improvement__overview__0001", gen_corp_improvement__overview__0001)
-builder.add_node("gen_corp_performance__overview__0001", gen_corp_performance__overview__0001)
-builder.add_node("gen_corp_leadership__overview__0001", gen_corp_leadership__overview__0001)
-builder.add_node("gen_corp_planning__overview__0001", gen_corp_planning__overview__0001)
-builder.add_node("gen_corp_support__overview__0001", gen_corp_support__overview__0001)
-builder.add_node("gen_corp_operation__overview__0001", gen_corp_operation__overview__0001)
-builder.add_node("gen_corporate_tier_1__ims_scope__0002__QSE_4_3_STMT_01", gen_corporate_tier_1__ims_scope__0002__QSE_4_3_STMT_01)
-builder.add_node("gen_corporate_tier_1__ims_manual__0001__QSE_1_MAN_01", gen_corporate_tier_1__ims_manual__0001__QSE_1_MAN_01)
-builder.add_node("gen_corp_risk_management__opportunity_register__0003__QSE_6_1_REG_02", gen_corp_risk_management__opportunity_register__0003__QSE_6_1_REG_02)
-builder.add_node("gen_corp_risk_management__risk_register__0002__QSE_6_1_REG_01", gen_corp_risk_management__risk_register__0002__QSE_6_1_REG_01)
-builder.add_node("gen_corp_risk_management__risk_procedure__0001__QSE_6_1_PROC_01", gen_corp_risk_management__risk_procedure__0001__QSE_6_1_PROC_01)
-builder.add_node("gen_corp_review__review_procedure__0001__QSE_9_3_PROC_01", gen_corp_review__review_procedure__0001__QSE_9_3_PROC_01)
-builder.add_node("gen_corp_policy_roles__qse_policy__0001__QSE_5_2_POL_01", gen_corp_policy_roles__qse_policy__0001__QSE_5_2_POL_01)
-builder.add_node("gen_corp_policy_roles__roles_matrix__0002__QSE_5_3_REG_01", gen_corp_policy_roles__roles_matrix__0002__QSE_5_3_REG_01)
-builder.add_node("gen_corp_op_procedures_templates__construction_control__0016__QSE_8_1_PROC_05", gen_corp_op_procedures_templates__construction_control__0016__QSE_8_1_PROC_05)
-builder.add_node("gen_corp_op_procedures_templates__design_control__0017__QSE_8_1_PROC_06", gen_corp_op_procedures_templates__design_control__0017__QSE_8_1_PROC_06)
-builder.add_node("gen_corp_op_procedures_templates__environmental_mgmt__0015__QSE_8_1_PROC_04", gen_corp_op_procedures_templates__environmental_mgmt__0015__QSE_8_1_PROC_04)
-builder.add_node("gen_corp_op_procedures_templates__procurement__0018__QSE_8_1_PROC_07", gen_corp_op_procedures_templates__procurement__0018__QSE_8_1_PROC_07)
-builder.add_node("gen_corp_op_procedures_templates__whs_mgmt__0014__QSE_8_1_PROC_03", gen_corp_op_procedures_templates__whs_mgmt__0014__QSE_8_1_PROC_03)
-builder.add_node("gen_corp_op_procedures_templates__incident_report__0012__QSE_8_1_PROC_02", gen_corp_op_procedures_templates__incident_report__0012__QSE_8_1_PROC_02)
-builder.add_node("gen_corp_op_procedures_templates__pqp_template__0002__QSE_8_1_TEMP_PQP", gen_corp_op_procedures_templates__pqp_template__0002__QSE_8_1_TEMP_PQP)
-builder.add_node("gen_corp_op_procedures_templates__proj_mgmt__0001__QSE_8_1_PROC_01", gen_corp_op_procedures_templates__proj_mgmt__0001__QSE_8_1_PROC_01)
-builder.add_node("gen_corp_objectives__objectives_plan__0002__QSE_6_2_PLN_01", gen_corp_objectives__objectives_plan__0002__QSE_6_2_PLN_01)
-builder.add_node("gen_corp_objectives__objectives_procedure__0001__QSE_6_2_PROC_01", gen_corp_objectives__objectives_procedure__0001__QSE_6_2_PROC_01)
-builder.add_node("gen_corp_ncr__ncr_procedure__0001__QSE_10_2_PROC_01", gen_corp_ncr__ncr_procedure__0001__QSE_10_2_PROC_01)
-builder.add_node("gen_corp_ncr__ncr_register__0002__QSE_10_2_REG_01", gen_corp_ncr__ncr_register__0002__QSE_10_2_REG_01)
-builder.add_node("gen_corp_monitoring__monitoring_procedure__0001__QSE_9_1_PROC_01", gen_corp_monitoring__monitoring_procedure__0001__QSE_9_1_PROC_01)
-builder.add_node("gen_corp_legal__legal_procedure__0001__QSE_6_1_PROC_02", gen_corp_legal__legal_procedure__0001__QSE_6_1_PROC_02)
-builder.add_node("gen_corp_legal__legal_register__0002__QSE_6_1_REG_03", gen_corp_legal__legal_register__0002__QSE_6_1_REG_03)
-builder.add_node("gen_corp_documentation__documentation_procedure__0001__QSE_7_5_PROC_01", gen_corp_documentation__documentation_procedure__0001__QSE_7_5_PROC_01)
-builder.add_node("gen_corp_documentation__master_register__0002__QSE_7_5_REG_01", gen_corp_documentation__master_register__0002__QSE_7_5_REG_01)
-builder.add_node("gen_corp_continual_improvement__improvement_register__0002__QSE_10_3_REG_01", gen_corp_continual_improvement__improvement_register__0002__QSE_10_3_REG_01)
-builder.add_node("gen_corp_continual_improvement__improvement_procedure__0001__QSE_10_3_PROC_01", gen_corp_continual_improvement__improvement_procedure__0001__QSE_10_3_PROC_01)
-builder.add_node("gen_corp_context__context_procedure__0001__QSE_4_1_PROC_01", gen_corp_context__context_procedure__0001__QSE_4_1_PROC_01)
-builder.add_node("gen_corp_context__issues_register__0002__QSE_4_1_REG_01", gen_corp_context__issues_register__0002__QSE_4_1_REG_01)
-builder.add_node("gen_corp_context__stakeholders_register__0003__QSE_4_2_REG_01", gen_corp_context__stakeholders_register__0003__QSE_4_2_REG_01)
-builder.add_node("gen_corp_consultation__hsc_minutes__0002__QSE_5_4_FORM_01", gen_corp_consultation__hsc_minutes__0002__QSE_5_4_FORM_01)
-builder.add_node("gen_corp_consultation__consult_procedure__0001__QSE_5_4_PROC_01", gen_corp_consultation__consult_procedure__0001__QSE_5_4_PROC_01)
-builder.add_node("gen_corp_competence__competence_procedure__0001__QSE_7_2_PROC_01", gen_corp_competence__competence_procedure__0001__QSE_7_2_PROC_01)
-builder.add_node("gen_corp_competence__training_matrix__0002__QSE_7_2_REG_01", gen_corp_competence__training_matrix__0002__QSE_7_2_REG_01)
-builder.add_node("gen_corp_communication__communication_matrix__0002__QSE_7_4_REG_01", gen_corp_communication__communication_matrix__0002__QSE_7_4_REG_01)
-builder.add_node("gen_corp_communication__communication_procedure__0001__QSE_7_4_PROC_01", gen_corp_communication__communication_procedure__0001__QSE_7_4_PROC_01)
-builder.add_node("gen_corp_audit__audit_procedure__0001__QSE_9_2_PROC_01", gen_corp_audit__audit_procedure__0001__QSE_9_2_PROC_01)
-builder.add_node("gen_corp_audit__audit_schedule__0002__QSE_9_2_SCHED_01", gen_corp_audit__audit_schedule__0002__QSE_9_2_SCHED_01)
-
-_GENERATION_NODES = [
-    "gen_corp_improvement__overview__0001",
-    "gen_corp_performance__overview__0001",
-    "gen_corp_leadership__overview__0001",
-    "gen_corp_planning__overview__0001",
-    "gen_corp_support__overview__0001",
-    "gen_corp_operation__overview__0001",
-    "gen_corporate_tier_1__ims_scope__0002__QSE_4_3_STMT_01",
-    "gen_corporate_tier_1__ims_manual__0001__QSE_1_MAN_01",
-    "gen_corp_risk_management__opportunity_register__0003__QSE_6_1_REG_02",
-    "gen_corp_risk_management__risk_register__0002__QSE_6_1_REG_01",
-    "gen_corp_risk_management__risk_procedure__0001__QSE_6_1_PROC_01",
-    "gen_corp_review__review_procedure__0001__QSE_9_3_PROC_01",
-    "gen_corp_policy_roles__qse_policy__0001__QSE_5_2_POL_01",
-    "gen_corp_policy_roles__roles_matrix__0002__QSE_5_3_REG_01",
-    "gen_corp_op_procedures_templates__construction_control__0016__QSE_8_1_PROC_05",
-    "gen_corp_op_procedures_templates__design_control__0017__QSE_8_1_PROC_06",
-    "gen_corp_op_procedures_templates__environmental_mgmt__0015__QSE_8_1_PROC_04",
-    "gen_corp_op_procedures_templates__procurement__0018__QSE_8_1_PROC_07",
-    "gen_corp_op_procedures_templates__whs_mgmt__0014__QSE_8_1_PROC_03",
-    "gen_corp_op_procedures_templates__incident_report__0012__QSE_8_1_PROC_02",
-    "gen_corp_op_procedures_templates__pqp_template__0002__QSE_8_1_TEMP_PQP",
-    "gen_corp_op_procedures_templates__proj_mgmt__0001__QSE_8_1_PROC_01",
-    "gen_corp_objectives__objectives_plan__0002__QSE_6_2_PLN_01",
-    "gen_corp_objectives__objectives_procedure__0001__QSE_6_2_PROC_01",
-    "gen_corp_ncr__ncr_procedure__0001__QSE_10_2_PROC_01",
-    "gen_corp_ncr__ncr_register__0002__QSE_10_2_REG_01",
-    "gen_corp_monitoring__monitoring_procedure__0001__QSE_9_1_PROC_01",
-    "gen_corp_legal__legal_procedure__0001__QSE_6_1_PROC_02",
-    "gen_corp_legal__legal_register__0002__QSE_6_1_REG_03",
-    "gen_corp_documentation__documentation_procedure__0001__QSE_7_5_PROC_01",
-    "gen_corp_documentation__master_register__0002__QSE_7_5_REG_01",
-    "gen_corp_continual_improvement__improvement_register__0002__QSE_10_3_REG_01",
-    "gen_corp_continual_improvement__improvement_procedure__0001__QSE_10_3_PROC_01",
-    "gen_corp_context__context_procedure__0001__QSE_4_1_PROC_01",
-    "gen_corp_context__issues_register__0002__QSE_4_1_REG_01",
-    "gen_corp_context__stakeholders_register__0003__QSE_4_2_REG_01",
-    "gen_corp_consultation__hsc_minutes__0002__QSE_5_4_FORM_01",
-    "gen_corp_consultation__consult_procedure__0001__QSE_5_4_PROC_01",
-    "gen_corp_competence__competence_procedure__0001__QSE_7_2_PROC_01",
-    "gen_corp_competence__training_matrix__0002__QSE_7_2_REG_01",
-    "gen_corp_communication__communication_matrix__0002__QSE_7_4_REG_01",
-    "gen_corp_communication__communication_procedure__0001__QSE_7_4_PROC_01",
-    "gen_corp_audit__audit_procedure__0001__QSE_9_2_PROC_01",
-    "gen_corp_audit__audit_schedule__0002__QSE_9_2_SCHED_01",
-]
+for node_name, fname in _FILE_BY_NODE.items():
+    builder.add_node(node_name, _make_generation_node(fname))
 
 builder.set_entry_point("init")
+# Fan out only to the requested documents instead of every node
+builder.add_conditional_edges("init", _route_targets, {n: n for n in _GENERATION_NODES})
 
 for node_name in _GENERATION_NODES:
-    builder.add_edge("init", node_name)
     builder.add_edge(node_name, END)
 
 
@@ -590,12 +379,61 @@ def create_qse_generation_graph():
     return builder.compile()
 
 
-def run_qse_docs(project_id: str, company_profile: Dict[str, Any], target_docs: Optional[List[str]] = None) -> Dict[str, Any]:
+def _initial_state(project_id: str, company_profile: Dict[str, Any], target_docs: Optional[List[str]]) -> GenerationState:
     effective_profile: Dict[str, Any] = company_profile if (company_profile and len(company_profile) > 0) else DEFAULT_COMPANY_PROFILE
-    inputs: GenerationInput = {
+    return {
         "project_id": project_id,
-        "company_profile": effective_profile,
+        "company_profile": effective_profile or {},
         "target_docs": target_docs or [],
+        "results": [],
     }
-    graph = create_qse_generation_graph()
-    return graph.invoke(inputs)
+
+
+# Upper bound on concurrent Gemini generations in run_qse_docs_async, to stay under provider rate limits
+_MAX_CONCURRENT_GENERATIONS = int(os.getenv("QSE_MAX_CONCURRENT_GENERATIONS", "4"))
+
+
+async def run_qse_docs_async(project_id: str, company_profile: Dict[str, Any], target_docs: Optional[List[str]] = None) -> Dict[str, Any]:
+    """Generate QSE documents concurrently without the LangGraph scheduler.
+
+    The generation nodes are independent of each other, so ``asyncio.gather`` gives the same
+    fan-out as the graph without per-node state merging; at most _MAX_CONCURRENT_GENERATIONS
+    run at once.
+    """
+    state = _initial_state(project_id, company_profile, target_docs)
+    selected = [_FILE_BY_NODE[n] for n in _GENERATION_NODES if _wanted(state["target_docs"], n)]
+    semaphore = asyncio.Semaphore(_MAX_CONCURRENT_GENERATIONS)
+
+    async def _bounded(fname: str) -> Optional[Dict[str, Any]]:
+        async with semaphore:
+            return await _load_and_generate_async(fname, state)
+
+    generated = await asyncio.gather(*(_bounded(fname) for fname in selected))
+    return {"results": [res for res in generated if res]}
+
+
+def run_qse_docs(
+    project_id: str,
+    company_profile: Dict[str, Any],
+    target_docs: Optional[List[str]] = None,
+    use_graph: bool = True,
+) -> Dict[str, Any]:
+    """Run QSE document generation through the compiled LangGraph.
+
+    ``use_graph=False`` runs run_qse_docs_async on a fresh event loop instead; async callers
+    should await run_qse_docs_async directly.
+    """
+    if use_graph:
+        state = _initial_state(project_id, company_profile, target_docs)
+        inputs: GenerationInput = {
+            "project_id": state["project_id"],
+            "company_profile": state["company_profile"],
+            "target_docs": state["target_docs"],
+        }
+        graph = create_qse_generation_graph()
+        return graph.invoke(inputs)
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(run_qse_docs_async(project_id, company_profile, target_docs))
+    raise RuntimeError("run_qse_docs(use_graph=False) called inside a running event loop; await run_qse_docs_async instead")
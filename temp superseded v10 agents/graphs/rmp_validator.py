@@ -1,10 +1,14 @@
 from typing import Dict, List, Any, Optional
+from typing_extensions import TypedDict
 from pydantic import BaseModel, Field
 from langgraph.graph import StateGraph, START, END
 from langchain_google_genai import ChatGoogleGenerativeAI
 import os
+import asyncio
 import logging
 from agent.tools.action_graph_repo import upsertAssetsAndEdges, IdempotentAssetWriteSpec
+from agent.graphs.document_context import combine_documents
+from agent.graphs.llm_cache import acached_invoke
 
 logger = logging.getLogger(__name__)
 
@@ -39,125 +43,139 @@ class RMPValidation(BaseModel):
     critical_findings: List[str] = Field(description="Critical findings requiring immediate attention")
     validation_confidence: float = Field(description="Confidence in validation assessment (0-1)")
 
-class RMPValidatorState(BaseModel):
+class RMPValidationResponse(BaseModel):
+    """Structured LLM response for RMP validation"""
+    compliance_score: float = Field(description="Overall compliance score (0-1)")
+    risk_assessments: List[RiskAssessment] = Field(description="Detailed risk assessments")
+    major_gaps: List[str] = Field(description="Major compliance gaps")
+    improvement_recs: List[str] = Field(description="Improvement recommendations")
+    regulatory_compliance: Dict[str, bool] = Field(description="Specific regulation compliance")
+    standard_alignment: Dict[str, float] = Field(description="Standard alignment scores")
+    critical_findings: List[str] = Field(description="Critical issues requiring attention")
+
+# Static instructions, sent as the system message so the provider can cache the prefix
+_RMP_SYSTEM_PROMPT = """Perform a comprehensive validation of the Risk Management Plan (RMP) against Australian regulatory requirements and industry standards.
+
+Validate the RMP against these requirements:
+
+1. WORK HEALTH SAFETY REGULATIONS (WHS, Model WHS Laws)
+2. ENVIRONMENTAL REGULATIONS (EP&A Act, Protection of the Environment Operations Act)
+3. CONSTRUCTION STANDARDS (AS/NZS ISO 31000, AS 2061)
+4. JURISDICTIONAL REQUIREMENTS (state-specific regulations)
+5. INDUSTRY BEST PRACTICES (risk management frameworks)
+
+Assess:
+- Risk identification completeness
+- Risk assessment methodology
+- Mitigation strategy adequacy
+- Monitoring and review processes
+- Compliance with regulatory requirements
+- Alignment with project scope and complexity
+
+Provide detailed findings and recommendations."""
+
+# Per-call project inputs, filled with format_map
+_RMP_PROMPT = """PROJECT DETAILS:
+{project_html}
+
+JURISDICTION:
+{jurisdiction}
+
+RISK MANAGEMENT PLAN CONTENT:
+{rmp}
+
+ADDITIONAL PROJECT DOCUMENTS:
+{docs}"""
+
+# Structured LLM bound once at import instead of per validation call
+structured_rmp_llm = llm.with_structured_output(RMPValidationResponse)
+
+class RMPValidatorState(TypedDict, total=False):
     """State for RMP validation following V9 patterns"""
     project_id: str
-    txt_project_documents: List[Dict[str, Any]] = []
-    project_details: Optional[Dict[str, Any]] = None
-    jurisdiction_analysis: Optional[Dict[str, Any]] = None
-    rmp_document: Optional[Dict[str, Any]] = None
-    rmp_validation: Optional[Dict[str, Any]] = None
-    asset_specs: List[Dict[str, Any]] = []
-    error: Optional[str] = None
-
-class InputState(BaseModel):
+    txt_project_documents: List[Dict[str, Any]]
+    project_details: Optional[Dict[str, Any]]
+    jurisdiction_analysis: Optional[Dict[str, Any]]
+    rmp_document: Optional[Dict[str, Any]]
+    rmp_validation: Optional[Dict[str, Any]]
+    asset_specs: List[Dict[str, Any]]
+    error: Optional[str]
+
+class InputState(TypedDict, total=False):
     """Input state for RMP validation"""
     project_id: str
-    txt_project_documents: List[Dict[str, Any]] = []
-    project_details: Optional[Dict[str, Any]] = None
-    jurisdiction_analysis: Optional[Dict[str, Any]] = None
-    rmp_document: Optional[Dict[str, Any]] = None
+    txt_project_documents: List[Dict[str, Any]]
+    project_details: Optional[Dict[str, Any]]
+    jurisdiction_analysis: Optional[Dict[str, Any]]
+    rmp_document: Optional[Dict[str, Any]]
 
-class OutputState(BaseModel):
+class OutputState(TypedDict, total=False):
     """Output state for RMP validation"""
-    rmp_validation: Optional[Dict[str, Any]] = None
-    asset_specs: List[Dict[str, Any]] = []
-    error: Optional[str] = None
-
-def validate_rmp_node(state: RMPValidatorState) -> RMPValidatorState:
+    rmp_validation: Optional[Dict[str, Any]]
+    asset_specs: List[Dict[str, Any]]
+    error: Optional[str]
+
+def _score_validation(
+    has_docs: bool, has_details: bool, has_jurisdiction: bool, has_rmp: bool, compliance_score: float
+) -> tuple:
+    """Return (validation_confidence, validation_status) for one RMP validation"""
+    # Calculate validation confidence based on input completeness
+    input_completeness = (has_docs + has_details + has_jurisdiction + has_rmp) * 0.25
+    validation_confidence = min(0.95, input_completeness * 0.9 + 0.1)
+
+    # Determine overall validation status
+    if compliance_score >= 0.8:
+        return validation_confidence, "COMPLIANT"
+    if compliance_score >= 0.6:
+        return validation_confidence, "PARTIALLY COMPLIANT"
+    return validation_confidence, "NON-COMPLIANT"
+
+async def validate_rmp_node(state: RMPValidatorState) -> RMPValidatorState:
     """Validate Risk Management Plan using LLM analysis - NO REGEX, NO MOCK DATA"""
 
     try:
-        docs = state.txt_project_documents or []
-        project_details = state.project_details or {}
-        jurisdiction = state.jurisdiction_analysis or {}
-        rmp_doc = state.rmp_document or {}
+        docs = state.get("txt_project_documents") or []
+        doc_ids = [i for d in docs if (i := d.get('id'))]
+        project_details = state.get("project_details") or {}
+        jurisdiction = state.get("jurisdiction_analysis") or {}
+        rmp_doc = state.get("rmp_document") or {}
 
-        combined_content = "\n\n".join([
-            f"Document: {d.get('file_name','Unknown')} (ID: {d.get('id','')})\n{d.get('content','')}"
-            for d in docs
-        ])
+        combined_content = combine_documents(docs)
 
         rmp_content = rmp_doc.get('content', 'RMP document not provided')
 
         # LLM prompt for RMP validation
-        rmp_validation_prompt = f"""
-        Perform a comprehensive validation of the Risk Management Plan (RMP) against Australian regulatory requirements and industry standards.
-
-        PROJECT DETAILS:
-        {project_details.get('html', 'Not provided')}
-
-        JURISDICTION:
-        {jurisdiction.get('jurisdiction', 'Not specified')}
-
-        RISK MANAGEMENT PLAN CONTENT:
-        {rmp_content}
-
-        ADDITIONAL PROJECT DOCUMENTS:
-        {combined_content}
-
-        Validate the RMP against these requirements:
-
-        1. WORK HEALTH SAFETY REGULATIONS (WHS, Model WHS Laws)
-        2. ENVIRONMENTAL REGULATIONS (EP&A Act, Protection of the Environment Operations Act)
-        3. CONSTRUCTION STANDARDS (AS/NZS ISO 31000, AS 2061)
-        4. JURISDICTIONAL REQUIREMENTS (state-specific regulations)
-        5. INDUSTRY BEST PRACTICES (risk management frameworks)
-
-        Assess:
-        - Risk identification completeness
-        - Risk assessment methodology
-        - Mitigation strategy adequacy
-        - Monitoring and review processes
-        - Compliance with regulatory requirements
-        - Alignment with project scope and complexity
-
-        Provide detailed findings and recommendations.
-        """
-
-        # Create structured LLM for RMP validation
-        class RMPValidationResponse(BaseModel):
-            compliance_score: float = Field(description="Overall compliance score (0-1)")
-            risk_assessments: List[RiskAssessment] = Field(description="Detailed risk assessments")
-            major_gaps: List[str] = Field(description="Major compliance gaps")
-            improvement_recs: List[str] = Field(description="Improvement recommendations")
-            regulatory_compliance: Dict[str, bool] = Field(description="Specific regulation compliance")
-            standard_alignment: Dict[str, float] = Field(description="Standard alignment scores")
-            critical_findings: List[str] = Field(description="Critical issues requiring attention")
-
-        structured_llm = llm.with_structured_output(RMPValidationResponse)
-        validation_result = structured_llm.invoke(rmp_validation_prompt)
-
-        # Calculate validation confidence based on input completeness
-        input_completeness = sum([
-            1 if docs else 0,
-            1 if project_details else 0,
-            1 if jurisdiction else 0,
-            1 if rmp_doc else 0
-        ]) / 4.0
-
-        validation_confidence = min(0.95, input_completeness * 0.9 + 0.1)
-
-        # Determine overall validation status
-        if validation_result.compliance_score >= 0.8:
-            validation_status = "COMPLIANT"
-        elif validation_result.compliance_score >= 0.6:
-            validation_status = "PARTIALLY COMPLIANT"
-        else:
-            validation_status = "NON-COMPLIANT"
+        rmp_validation_prompt = _RMP_PROMPT.format_map({
+            "project_html": project_details.get('html', 'Not provided'),
+            "jurisdiction": jurisdiction.get('jurisdiction', 'Not specified'),
+            "rmp": rmp_content,
+            "docs": combined_content,
+        })
+
+        validation_result = await acached_invoke(
+            structured_rmp_llm, rmp_validation_prompt, RMPValidationResponse, llm.model, system=_RMP_SYSTEM_PROMPT
+        )
+
+        validation_confidence, validation_status = _score_validation(
+            bool(docs), bool(project_details), bool(jurisdiction), bool(rmp_doc),
+            validation_result.compliance_score,
+        )
+
+        # Serialize the LLM result once and reuse it for every output below
+        core = validation_result.model_dump(mode="python")
 
         # Store LLM outputs for knowledge graph
         llm_outputs = {
             "rmp_validation": {
-                "compliance_score": validation_result.compliance_score,
+                "compliance_score": core["compliance_score"],
                 "validation_status": validation_status,
-                "risk_assessments": [r.model_dump() for r in validation_result.risk_assessments],
-                "major_gaps": validation_result.major_gaps,
-                "improvement_recommendations": validation_result.improvement_recs,
-                "regulatory_compliance": validation_result.regulatory_compliance,
-                "standard_alignment": validation_result.standard_alignment,
-                "critical_findings": validation_result.critical_findings,
-                "input_documents": [d.get('id') for d in docs if d.get('id')],
+                "risk_assessments": core["risk_assessments"],
+                "major_gaps": core["major_gaps"],
+                "improvement_recommendations": core["improvement_recs"],
+                "regulatory_compliance": core["regulatory_compliance"],
+                "standard_alignment": core["standard_alignment"],
+                "critical_findings": core["critical_findings"],
+                "input_documents": doc_ids,
                 "validation_confidence": validation_confidence,
                 "timestamp": "2024-01-01T00:00:00Z"
             }
@@ -168,8 +186,8 @@ def validate_rmp_node(state: RMPValidatorState) -> RMPValidatorState:
             asset_type="analysis",
             asset_subtype="rmp_validation",
             name=f"RMP Validation - {validation_status} ({validation_result.compliance_score:.1%})",
-            description=f"Risk Management Plan validation for project {state.project_id}",
-            project_id=state.project_id,
+            description=f"Risk Management Plan validation for project {state['project_id']}",
+            project_id=state["project_id"],
             metadata={
                 "analysis_type": "rmp_validation",
                 "compliance_score": validation_result.compliance_score,
@@ -182,57 +200,47 @@ def validate_rmp_node(state: RMPValidatorState) -> RMPValidatorState:
             },
             content={
                 "validation_results": {
-                    "overall_score": validation_result.compliance_score,
+                    "overall_score": core["compliance_score"],
                     "status": validation_status,
-                    "risk_assessments": [r.model_dump() for r in validation_result.risk_assessments],
-                    "compliance_gaps": validation_result.major_gaps,
-                    "improvement_recommendations": validation_result.improvement_recs,
-                    "regulatory_compliance": validation_result.regulatory_compliance,
-                    "standard_alignment": validation_result.standard_alignment,
-                    "critical_findings": validation_result.critical_findings
+                    "risk_assessments": core["risk_assessments"],
+                    "compliance_gaps": core["major_gaps"],
+                    "improvement_recommendations": core["improvement_recs"],
+                    "regulatory_compliance": core["regulatory_compliance"],
+                    "standard_alignment": core["standard_alignment"],
+                    "critical_findings": core["critical_findings"]
                 },
-                "source_documents": [d.get('id') for d in docs if d.get('id')],
+                "source_documents": doc_ids,
                 "rmp_document_id": rmp_doc.get('id')
             },
-            idempotency_key=f"rmp_validation:{state.project_id}"
+            idempotency_key=f"rmp_validation:{state['project_id']}"
         )
 
         # Upsert to knowledge graph
-        upsert_result = upsertAssetsAndEdges([asset_spec])
-
-        return RMPValidatorState(
-            project_id=state.project_id,
-            txt_project_documents=state.txt_project_documents,
-            project_details=state.project_details,
-            jurisdiction_analysis=state.jurisdiction_analysis,
-            rmp_document=state.rmp_document,
-            rmp_validation={
-                "compliance_score": validation_result.compliance_score,
+        upsert_result = await asyncio.to_thread(upsertAssetsAndEdges, [asset_spec])
+
+        return {
+            "rmp_validation": {
+                "compliance_score": core["compliance_score"],
                 "validation_status": validation_status,
-                "risk_assessments": [r.model_dump() for r in validation_result.risk_assessments],
-                "compliance_gaps": validation_result.major_gaps,
-                "improvement_recommendations": validation_result.improvement_recs,
-                "regulatory_compliance": validation_result.regulatory_compliance,
-                "standard_alignment": validation_result.standard_alignment,
-                "critical_findings": validation_result.critical_findings,
+                "risk_assessments": core["risk_assessments"],
+                "compliance_gaps": core["major_gaps"],
+                "improvement_recommendations": core["improvement_recs"],
+                "regulatory_compliance": core["regulatory_compliance"],
+                "standard_alignment": core["standard_alignment"],
+                "critical_findings": core["critical_findings"],
                 "validation_confidence": validation_confidence
             },
-            asset_specs=[asset_spec.model_dump()],
-            error=None
-        )
+            "asset_specs": [asset_spec.model_dump()],
+            "error": None
+        }
 
     except Exception as e:
         logger.error(f"RMP validation failed: {str(e)}")
-        return RMPValidatorState(
-            project_id=state.project_id,
-            txt_project_documents=state.txt_project_documents,
-            project_details=state.project_details,
-            jurisdiction_analysis=state.jurisdiction_analysis,
-            rmp_document=state.rmp_document,
-            rmp_validation=None,
-            asset_specs=[],
-            error=f"RMP validation failed: {str(e)}"
-        )
+        return {
+            "rmp_validation": None,
+            "asset_specs": [],
+            "error": f"RMP validation failed: {str(e)}"
+        }
 
 def create_rmp_validator_graph():
     """Create the RMP validator graph with persistence"""
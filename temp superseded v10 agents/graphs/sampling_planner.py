@@ -1,10 +1,14 @@
 from typing import Dict, List, Any, Optional
+from typing_extensions import TypedDict
 from pydantic import BaseModel, Field
 from langgraph.graph import StateGraph, START, END
 from langchain_google_genai import ChatGoogleGenerativeAI
 import os
+import asyncio
 import logging
 from agent.tools.action_graph_repo import upsertAssetsAndEdges, IdempotentAssetWriteSpec
+from agent.graphs.document_context import format_document
+from agent.graphs.llm_cache import adelta_invoke
 
 logger = logging.getLogger(__name__)
 
@@ -47,44 +51,85 @@ class SamplingPlan(BaseModel):
     contingency_procedures: List[str] = Field(description="Contingency procedures for non-conforming results")
     confidence_score: float = Field(description="Confidence in sampling plan adequacy (0-1)")
 
-class SamplingPlannerState(BaseModel):
+class SamplingPlanResponse(BaseModel):
+    """Structured LLM response for sampling plan generation"""
+    requirements: List[SamplingRequirement] = Field(description="Detailed sampling requirements")
+    locations: List[SamplingLocation] = Field(description="Sampling locations and methods")
+    qc_procedures: List[str] = Field(description="Quality control procedures")
+    testing_schedule: Dict[str, List[str]] = Field(description="Schedule by material type")
+    risk_considerations: List[str] = Field(description="Risk-based sampling factors")
+    compliance_matrix: Dict[str, List[str]] = Field(description="Standards to requirements mapping")
+    contingency_measures: List[str] = Field(description="Non-conformance procedures")
+
+# Static instructions, sent as the system message so the provider can cache the prefix
+_SAMPLING_SYSTEM_PROMPT = """Generate a comprehensive sampling and testing plan for this construction project based on applicable standards and specifications.
+
+Based on Australian Standards (AS 1289, AS 3600, etc.) and project requirements, develop a sampling plan that includes:
+
+1. MATERIAL TYPES: Concrete, soil, asphalt, aggregates, etc.
+2. TESTING REQUIREMENTS: Strength, gradation, contamination, etc.
+3. SAMPLING LOCATIONS: Source, production, placement sites
+4. SAMPLING METHODS: Grab samples, composite samples, etc.
+5. FREQUENCY REQUIREMENTS: Per batch, per day, per lot
+6. ACCEPTANCE CRITERIA: Specification compliance requirements
+7. QUALITY CONTROL PROCEDURES: Testing protocols and validation
+8. RISK-BASED SAMPLING: Critical vs routine testing
+
+Consider project scale, risk levels, and regulatory requirements."""
+
+# Per-call project inputs, filled with format_map
+_SAMPLING_INPUT_TEMPLATE = """PROJECT DETAILS:
+{project_html}
+
+WORK BREAKDOWN STRUCTURE:
+{wbs}
+
+APPLICABLE STANDARDS:
+{standards}
+
+DOCUMENT CONTENT:
+{docs}"""
+
+# Structured LLM bound once at import instead of per call
+structured_sampling_llm = llm.with_structured_output(SamplingPlanResponse)
+
+class SamplingPlannerState(TypedDict, total=False):
     """State for sampling plan generation following V9 patterns"""
     project_id: str
-    txt_project_documents: List[Dict[str, Any]] = []
-    project_details: Optional[Dict[str, Any]] = None
-    wbs_structure: Optional[Dict[str, Any]] = None
-    standards_resolution: Optional[Dict[str, Any]] = None
-    sampling_plan: Optional[Dict[str, Any]] = None
-    asset_specs: List[Dict[str, Any]] = []
-    error: Optional[str] = None
-
-class InputState(BaseModel):
+    txt_project_documents: List[Dict[str, Any]]
+    project_details: Optional[Dict[str, Any]]
+    wbs_structure: Optional[Dict[str, Any]]
+    standards_resolution: Optional[Dict[str, Any]]
+    sampling_plan: Optional[Dict[str, Any]]
+    asset_specs: List[Dict[str, Any]]
+    error: Optional[str]
+
+class InputState(TypedDict, total=False):
     """Input state for sampling plan generation"""
     project_id: str
-    txt_project_documents: List[Dict[str, Any]] = []
-    project_details: Optional[Dict[str, Any]] = None
-    wbs_structure: Optional[Dict[str, Any]] = None
-    standards_resolution: Optional[Dict[str, Any]] = None
+    txt_project_documents: List[Dict[str, Any]]
+    project_details: Optional[Dict[str, Any]]
+    wbs_structure: Optional[Dict[str, Any]]
+    standards_resolution: Optional[Dict[str, Any]]
 
-class OutputState(BaseModel):
+class OutputState(TypedDict, total=False):
     """Output state for sampling plan generation"""
-    sampling_plan: Optional[Dict[str, Any]] = None
-    asset_specs: List[Dict[str, Any]] = []
-    error: Optional[str] = None
+    sampling_plan: Optional[Dict[str, Any]]
+    asset_specs: List[Dict[str, Any]]
+    error: Optional[str]
 
-def generate_sampling_plan_node(state: SamplingPlannerState) -> SamplingPlannerState:
+async def generate_sampling_plan_node(state: SamplingPlannerState) -> SamplingPlannerState:
     """Generate sampling plan using LLM analysis - NO REGEX, NO MOCK DATA"""
 
     try:
-        docs = state.txt_project_documents or []
-        project_details = state.project_details or {}
-        wbs = state.wbs_structure or {}
-        standards = state.standards_resolution or {}
+        docs = state.get("txt_project_documents") or []
+        doc_ids = [i for d in docs if (i := d.get('id'))]
+        project_details = state.get("project_details") or {}
+        wbs = state.get("wbs_structure") or {}
+        standards = state.get("standards_resolution") or {}
 
-        combined_content = "\n\n".join([
-            f"Document: {d.get('file_name','Unknown')} (ID: {d.get('id','')})\n{d.get('content','')}"
-            for d in docs
-        ])
+        doc_blocks = [format_document(d) for d in docs]
+        combined_content = "\n\n".join(doc_blocks)
 
         standards_text = ""
         if "primary_standards" in standards:
@@ -93,70 +138,34 @@ def generate_sampling_plan_node(state: SamplingPlannerState) -> SamplingPlannerS
                 for s in standards["primary_standards"]
             ])
 
-        # LLM prompt for sampling plan generation
-        sampling_prompt = f"""
-        Generate a comprehensive sampling and testing plan for this construction project based on applicable standards and specifications.
-
-        PROJECT DETAILS:
-        {project_details.get('html', 'Not provided')}
-
-        WORK BREAKDOWN STRUCTURE:
-        {wbs.get('description', 'Not provided')}
-
-        APPLICABLE STANDARDS:
-        {standards_text}
-
-        DOCUMENT CONTENT:
-        {combined_content}
-
-        Based on Australian Standards (AS 1289, AS 3600, etc.) and project requirements, develop a sampling plan that includes:
-
-        1. MATERIAL TYPES: Concrete, soil, asphalt, aggregates, etc.
-        2. TESTING REQUIREMENTS: Strength, gradation, contamination, etc.
-        3. SAMPLING LOCATIONS: Source, production, placement sites
-        4. SAMPLING METHODS: Grab samples, composite samples, etc.
-        5. FREQUENCY REQUIREMENTS: Per batch, per day, per lot
-        6. ACCEPTANCE CRITERIA: Specification compliance requirements
-        7. QUALITY CONTROL PROCEDURES: Testing protocols and validation
-        8. RISK-BASED SAMPLING: Critical vs routine testing
-
-        Consider project scale, risk levels, and regulatory requirements.
-        """
-
-        # Create structured LLM for sampling plan
-        class SamplingPlanResponse(BaseModel):
-            requirements: List[SamplingRequirement] = Field(description="Detailed sampling requirements")
-            locations: List[SamplingLocation] = Field(description="Sampling locations and methods")
-            qc_procedures: List[str] = Field(description="Quality control procedures")
-            testing_schedule: Dict[str, List[str]] = Field(description="Schedule by material type")
-            risk_considerations: List[str] = Field(description="Risk-based sampling factors")
-            compliance_matrix: Dict[str, List[str]] = Field(description="Standards to requirements mapping")
-            contingency_measures: List[str] = Field(description="Non-conformance procedures")
-
-        structured_llm = llm.with_structured_output(SamplingPlanResponse)
-        sampling_result = structured_llm.invoke(sampling_prompt)
+        # Per-call inputs only; the static instructions go in the system message
+        prompt_inputs = {
+            "project_html": project_details.get('html', 'Not provided'),
+            "wbs": wbs.get('description', 'Not provided'),
+            "standards": standards_text,
+        }
+        sampling_prompt = _SAMPLING_INPUT_TEMPLATE.format_map({**prompt_inputs, "docs": combined_content})
+        # Everything except the documents; a changed context forces a full evaluation
+        delta_context = _SAMPLING_INPUT_TEMPLATE.format_map({**prompt_inputs, "docs": "[see documents below]"})
+        sampling_result = await adelta_invoke(
+            structured_sampling_llm, sampling_prompt, SamplingPlanResponse, llm.model,
+            session=f"sampling_plan:{state['project_id']}", blocks=doc_blocks, context=delta_context,
+            system=_SAMPLING_SYSTEM_PROMPT,
+        )
 
         # Calculate confidence based on input completeness
-        input_completeness = sum([
-            1 if docs else 0,
-            1 if project_details else 0,
-            1 if wbs else 0,
-            1 if standards else 0
-        ]) / 4.0
+        input_completeness = (bool(docs) + bool(project_details) + bool(wbs) + bool(standards)) * 0.25
 
         confidence_score = min(0.9, input_completeness * 0.8 + 0.1)  # Base confidence with input bonus
 
+        # Serialize the LLM result once and reuse it for every output below
+        core = sampling_result.model_dump(mode="python")
+
         # Store LLM outputs for knowledge graph
         llm_outputs = {
             "sampling_plan": {
-                "requirements": [r.model_dump() for r in sampling_result.requirements],
-                "locations": [l.model_dump() for l in sampling_result.locations],
-                "qc_procedures": sampling_result.qc_procedures,
-                "testing_schedule": sampling_result.testing_schedule,
-                "risk_considerations": sampling_result.risk_considerations,
-                "compliance_matrix": sampling_result.compliance_matrix,
-                "contingency_measures": sampling_result.contingency_measures,
-                "input_documents": [d.get('id') for d in docs if d.get('id')],
+                **core,
+                "input_documents": doc_ids,
                 "confidence_score": confidence_score,
                 "timestamp": "2024-01-01T00:00:00Z"
             }
@@ -167,64 +176,48 @@ def generate_sampling_plan_node(state: SamplingPlannerState) -> SamplingPlannerS
             asset_type="plan",
             asset_subtype="sampling_plan",
             name=f"Sampling Plan - {len(sampling_result.requirements)} Requirements",
-            description=f"Comprehensive sampling and testing plan for project {state.project_id}",
-            project_id=state.project_id,
+            description=f"Comprehensive sampling and testing plan for project {state['project_id']}",
+            project_id=state["project_id"],
             metadata={
                 "plan_type": "sampling_plan",
                 "total_requirements": len(sampling_result.requirements),
                 "sampling_locations": len(sampling_result.locations),
-                "material_types_covered": list(sampling_result.testing_schedule.keys()),
+                "material_types_covered": [*core["testing_schedule"]],
                 "confidence_score": confidence_score,
                 "llm_outputs": llm_outputs
             },
             content={
-                "sampling_requirements": [r.model_dump() for r in sampling_result.requirements],
-                "sampling_locations": [l.model_dump() for l in sampling_result.locations],
-                "quality_control_procedures": sampling_result.qc_procedures,
-                "testing_schedule": sampling_result.testing_schedule,
-                "risk_based_considerations": sampling_result.risk_considerations,
-                "standards_compliance_matrix": sampling_result.compliance_matrix,
-                "contingency_procedures": sampling_result.contingency_measures,
-                "source_documents": [d.get('id') for d in docs if d.get('id')]
+                "sampling_requirements": core["requirements"],
+                "sampling_locations": core["locations"],
+                "quality_control_procedures": core["qc_procedures"],
+                "testing_schedule": core["testing_schedule"],
+                "risk_based_considerations": core["risk_considerations"],
+                "standards_compliance_matrix": core["compliance_matrix"],
+                "contingency_procedures": core["contingency_measures"],
+                "source_documents": doc_ids
             },
-            idempotency_key=f"sampling_plan:{state.project_id}"
+            idempotency_key=f"sampling_plan:{state['project_id']}"
         )
 
         # Upsert to knowledge graph
-        upsert_result = upsertAssetsAndEdges([asset_spec])
-
-        return SamplingPlannerState(
-            project_id=state.project_id,
-            txt_project_documents=state.txt_project_documents,
-            project_details=state.project_details,
-            wbs_structure=state.wbs_structure,
-            standards_resolution=state.standards_resolution,
-            sampling_plan={
-                "requirements": [r.model_dump() for r in sampling_result.requirements],
-                "locations": [l.model_dump() for l in sampling_result.locations],
-                "qc_procedures": sampling_result.qc_procedures,
-                "testing_schedule": sampling_result.testing_schedule,
-                "risk_considerations": sampling_result.risk_considerations,
-                "compliance_matrix": sampling_result.compliance_matrix,
-                "contingency_measures": sampling_result.contingency_measures,
+        upsert_result = await asyncio.to_thread(upsertAssetsAndEdges, [asset_spec])
+
+        return {
+            "sampling_plan": {
+                **core,
                 "confidence_score": confidence_score
             },
-            asset_specs=[asset_spec.model_dump()],
-            error=None
-        )
+            "asset_specs": [asset_spec.model_dump()],
+            "error": None
+        }
 
     except Exception as e:
         logger.error(f"Sampling plan generation failed: {str(e)}")
-        return SamplingPlannerState(
-            project_id=state.project_id,
-            txt_project_documents=state.txt_project_documents,
-            project_details=state.project_details,
-            wbs_structure=state.wbs_structure,
-            standards_resolution=state.standards_resolution,
-            sampling_plan=None,
-            asset_specs=[],
-            error=f"Sampling plan generation failed: {str(e)}"
-        )
+        return {
+            "sampling_plan": None,
+            "asset_specs": [],
+            "error": f"Sampling plan generation failed: {str(e)}"
+        }
 
 def create_sampling_planner_graph():
     """Create the sampling planner graph with persistence"""
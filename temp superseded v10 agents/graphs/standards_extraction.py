@@ -1,14 +1,18 @@
 from langgraph.graph import StateGraph, START, END
-from typing import List, Dict, Any, Optional, Annotated
+from typing import List, Dict, Any, Optional, Annotated, Tuple
 from typing_extensions import TypedDict
 from agent.tools.db_tools import fetch_reference_documents, upsert_asset
-from agent.prompts.standards_extraction_prompt import STANDARDS_EXTRACTION_PROMPT
+from agent.prompts.standards_extraction_prompt import render_standards_extraction_prompt
+from agent.graphs.document_context import combine_documents
+from agent.graphs.llm_clients import gemini_flash, get_structured
 import logging
 from operator import add
 from langgraph.constants import Send
 from pydantic import BaseModel, Field
 import os
-from langchain_google_genai import ChatGoogleGenerativeAI
+import re
+import threading
+import time
 # from ..orchestrator import OrchestratorState  # Remove this line
 
 logger = logging.getLogger(__name__)
@@ -28,14 +32,31 @@ class ExtractedStandards(BaseModel):
     """Schema for extracted standards response."""
     standards: List[ExtractedStandard] = Field(description="List of standards found with database information")
 
+# Shared flash client; the structured binding is built once at import instead of per document
+structured_standards_llm = get_structured(gemini_flash, ExtractedStandards, method="json_mode")
+
+def _fast_dump(model: BaseModel) -> Dict[str, Any]:
+    """Shallow dict of a flat model; ExtractedStandard has no nested models, aliases or computed fields."""
+    return model.__dict__.copy()
+
 class StandardsState(TypedDict):  # Change to standalone TypedDict
     project_id: str
     txt_project_documents: List[Dict[str, Any]]
     reference_database: Optional[List[Dict[str, Any]]]
+    # Per-document results from the parallel extraction branches, merged by the add reducer
+    extracted_standards: Annotated[List[Dict[str, Any]], add]
+    extraction_errors: Annotated[List[str], add]
+    failed_document_ids: Annotated[List[str], add]
     standards_from_project_documents: List[Dict[str, Any]]
     error: Optional[str]
     done: bool
 
+class DocumentStandardsState(TypedDict):
+    """Payload sent to one extraction branch: a batch of documents sharing one prompt."""
+    project_id: str
+    docs: List[Dict[str, Any]]
+    ref_db_text: str
+
 class InputState(TypedDict):
     project_id: str
     txt_project_documents: List[Dict[str, Any]]
@@ -45,80 +66,201 @@ class OutputState(TypedDict):
     error: Optional[str]
     done: bool
 
-def fetch_reference_database_node(state: StandardsState) -> StandardsState:
-    ref_db = fetch_reference_documents.invoke({})
-    return {**state, "reference_database": ref_db}
+def _prompt_documents(state: StandardsState) -> List[Dict[str, Any]]:
+    # Only the fields the extraction prompt and register use
+    return [{'id': d['id'], 'file_name': d['file_name'], 'content': d['content']} for d in state["txt_project_documents"]]
 
-def extract_standards_node(state: StandardsState) -> StandardsState:
-    ref_db = state["reference_database"]
-    txt_docs = [{k: v for k, v in doc.items() if k not in ['blob_url', 'project_id']} for doc in state["txt_project_documents"]]
-    
-    if not txt_docs:
-        return {"standards_from_project_documents": [], "done": True, "error": None}
-    
-    ref_db_text = ""
+_NON_ALNUM = re.compile(r"[^0-9A-Za-z]+")
+
+def _norm_code(text: str) -> str:
+    # "MRTS 04", "mrts04" and "MRTS-04" all compare equal
+    return _NON_ALNUM.sub("", text or "").upper()
+
+def _build_reference_db_text(ref_db: List[Dict[str, Any]]) -> str:
+    # Duplicate rows (same Spec ID modulo spacing/case, same org) only cost prompt tokens; keep the first
+    unique: Dict[Tuple[str, Any], Dict[str, Any]] = {}
     for ref in ref_db:
-        ref_db_text += f"UUID: {ref['id']}, Spec ID: {ref['spec_id']}, Name: {ref['spec_name']}, Org: {ref['org_identifier']}\n"
-    
-    combined_content = "\n\n".join([f"Document: {doc['file_name']} (ID: {doc['id']})\n{doc['content']}" for doc in txt_docs])
-    
-    prompt = STANDARDS_EXTRACTION_PROMPT.format(
-        reference_db_text=ref_db_text,
-        document_content=combined_content
+        unique.setdefault((_norm_code(ref['spec_id']), ref['org_identifier']), ref)
+    return "".join(
+        f"UUID: {ref['id']}, Spec ID: {ref['spec_id']}, Name: {ref['spec_name']}, Org: {ref['org_identifier']}\n"
+        for ref in unique.values()
     )
-    
-    llm = ChatGoogleGenerativeAI(
-        model=os.getenv("GEMINI_MODEL"),
-        google_api_key=os.getenv("GOOGLE_API_KEY"),
-        thinking_budget=-1,
-        include_thoughts=False
-    )
-    structured_llm = llm.with_structured_output(ExtractedStandards, method="json_mode")
+
+# The reference table rarely changes; keep it (and its prompt text) for an hour per process
+_REF_CACHE_TTL_SECONDS = 3600
+_ref_cache: Optional[Tuple[float, List[Dict[str, Any]], str]] = None
+_ref_cache_lock = threading.Lock()
+
+def _cached_reference_database() -> List[Dict[str, Any]]:
+    global _ref_cache
+    with _ref_cache_lock:
+        if _ref_cache is not None and time.monotonic() - _ref_cache[0] < _REF_CACHE_TTL_SECONDS:
+            return _ref_cache[1]
+    ref_db = fetch_reference_documents.invoke({})
+    with _ref_cache_lock:
+        _ref_cache = (time.monotonic(), ref_db, _build_reference_db_text(ref_db))
+    return ref_db
+
+def _reference_db_text(ref_db: List[Dict[str, Any]]) -> str:
+    cached = _ref_cache
+    if cached is not None and cached[1] is ref_db:
+        return cached[2]
+    return _build_reference_db_text(ref_db)
+
+# Opt-in: send each batch only the reference rows whose Spec ID occurs in its documents
+_REF_PREFILTER = os.getenv("STANDARDS_REF_PREFILTER", "").lower() in ("1", "true", "yes")
+
+def _prefiltered_reference_text(docs: List[Dict[str, Any]], ref_db: List[Dict[str, Any]]) -> Optional[str]:
+    """Reference text limited to rows mentioned in docs, or None when nothing matched.
+
+    Substring checks run on the normalised documents, so spacing/case variants and suffixed
+    editions ("AS 1234.1-2020" for "AS 1234") still hit; extra hits only cost a few tokens.
+    """
+    content = "\n".join(_norm_code(d.get('content', '')) for d in docs)
+    hits = [ref for ref in ref_db if (code := _norm_code(ref.get('spec_id'))) and code in content]
+    return _build_reference_db_text(hits) if hits else None
+
+def _document_reference_text(docs: List[Dict[str, Any]], ref_db: List[Dict[str, Any]], ref_db_text: str) -> str:
+    if not _REF_PREFILTER:
+        return ref_db_text
+    # With no candidate the model still gets the full table to match loose variants against
+    return _prefiltered_reference_text(docs, ref_db) or ref_db_text
+
+# Documents are packed into one prompt up to this many characters of content, so the
+# reference table (usually the largest block) is sent once per batch instead of per document
+_BATCH_MAX_CHARS = int(os.getenv("STANDARDS_BATCH_MAX_CHARS", "120000"))
+
+def _batch_documents(docs: List[Dict[str, Any]]) -> List[List[Dict[str, Any]]]:
+    """Greedily group documents in order; a document over the budget gets a batch of its own."""
+    batches: List[List[Dict[str, Any]]] = []
+    current: List[Dict[str, Any]] = []
+    size = 0
+    for doc in docs:
+        length = len(doc['content'] or "")
+        if current and size + length > _BATCH_MAX_CHARS:
+            batches.append(current)
+            current, size = [], 0
+        current.append(doc)
+        size += length
+    if current:
+        batches.append(current)
+    return batches
+
+def fetch_reference_database_node(state: StandardsState) -> StandardsState:
+    return {"reference_database": _cached_reference_database()}
+
+def route_documents(state: StandardsState):
+    """Fan out one extraction branch per document batch; with no documents go straight to the merge."""
+    txt_docs = _prompt_documents(state)
+    if not txt_docs:
+        return "merge_standards"
+    ref_db = state["reference_database"] or []
+    ref_db_text = _reference_db_text(ref_db)
+    return [
+        Send("extract_document_standards", {
+            "project_id": state["project_id"],
+            "docs": batch,
+            "ref_db_text": _document_reference_text(batch, ref_db, ref_db_text),
+        })
+        for batch in _batch_documents(txt_docs)
+    ]
+
+def _with_batch_document_ids(std: ExtractedStandard, batch_ids: List[str]) -> Dict[str, Any]:
+    """Dump std keeping only document_ids that belong to the batch the model was shown."""
+    out = _fast_dump(std)
+    ids = [doc_id for doc_id in std.document_ids if doc_id in batch_ids]
+    if not ids and len(batch_ids) == 1:
+        # A single-document batch can only have come from that document
+        ids = list(batch_ids)
+    out["document_ids"] = ids
+    return out
+
+def extract_document_standards_node(state: DocumentStandardsState) -> Dict[str, Any]:
+    docs = state["docs"]
+    batch_ids = [str(d.get('id')) for d in docs]
+    doc_ids = ", ".join(batch_ids)
+    prompt = render_standards_extraction_prompt(state["ref_db_text"], combine_documents(docs))
     
     try:
-        parsed_response = structured_llm.invoke(prompt)
-        
+        parsed_response = structured_standards_llm.invoke(prompt)
         if not parsed_response:
-            return {"error": "No parsed response from LLM", "done": True}
-        
-        standards_list = [std.model_dump() for std in parsed_response.standards]
-        # Save to assets as a plan-type asset 'Standards Register' with richer metadata
-        try:
-            source_document_ids = [doc.get('id') for doc in txt_docs if doc.get('id')]
-            upsert_asset.invoke({
-                "project_id": state["project_id"],
-                "asset_type": "plan",
-                "name": "Standards Register",
-                "content": {
-                    "title": "Standards Register",
-                    "nodes": standards_list,
-                    "summary": {
-                        "total_references": len(standards_list),
-                        "found_in_database": sum(1 for s in standards_list if s.get('found_in_database')),
-                        "unique_codes": len({s.get('standard_code') for s in standards_list if s.get('standard_code')})
-                    }
-                },
-                "metadata": {
-                    "plan_type": "standards_register",
-                    "category": "register",
-                    "tags": ["standards", "register", "compliance", "references"],
-                    "source_document_ids": source_document_ids,
-                },
-                "document_number": None,
-            })
-        except Exception:
-            pass
-        return {"standards_from_project_documents": standards_list, "done": True}
+            return {
+                "extraction_errors": [f"No parsed response from LLM for documents {doc_ids}"],
+                "failed_document_ids": batch_ids,
+            }
+        return {"extracted_standards": [_with_batch_document_ids(std, batch_ids) for std in parsed_response.standards]}
     except Exception as e:
-        logger.error(f"Error extracting standards: {e}")
-        return {"error": str(e), "done": True}
+        logger.error(f"Error extracting standards from documents {doc_ids}: {e}")
+        return {"extraction_errors": [f"{doc_ids}: {e}"], "failed_document_ids": batch_ids}
+
+def _merge_by_code(extracted: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Collapse per-document hits of the same standard code, unioning their document_ids."""
+    merged: Dict[str, Dict[str, Any]] = {}
+    unnamed: List[Dict[str, Any]] = []
+    for std in extracted:
+        code = std.get('standard_code')
+        if not code:
+            unnamed.append(std)
+            continue
+        existing = merged.get(code)
+        if existing is None:
+            merged[code] = {**std, "document_ids": list(std.get('document_ids') or [])}
+            continue
+        for doc_id in std.get('document_ids') or []:
+            if doc_id not in existing["document_ids"]:
+                existing["document_ids"].append(doc_id)
+        if std.get('found_in_database') and not existing.get('found_in_database'):
+            merged[code] = {**std, "document_ids": existing["document_ids"]}
+    return [*merged.values(), *unnamed]
+
+def merge_standards_node(state: StandardsState) -> StandardsState:
+    errors = state.get("extraction_errors") or []
+    error = "; ".join(errors) if errors else None
+    standards_list = _merge_by_code(state.get("extracted_standards") or [])
+    txt_docs = _prompt_documents(state)
+    if not txt_docs:
+        return {"standards_from_project_documents": [], "done": True, "error": None}
+    if errors and not standards_list:
+        return {"error": error, "done": True}
+
+    # Save to assets as a plan-type asset 'Standards Register' with richer metadata
+    try:
+        source_document_ids = [doc.get('id') for doc in txt_docs if doc.get('id')]
+        upsert_asset.invoke({
+            "project_id": state["project_id"],
+            "asset_type": "plan",
+            "name": "Standards Register",
+            "content": {
+                "title": "Standards Register",
+                "nodes": standards_list,
+                "summary": {
+                    "total_references": len(standards_list),
+                    "found_in_database": sum(1 for s in standards_list if s.get('found_in_database')),
+                    "unique_codes": len({s.get('standard_code') for s in standards_list if s.get('standard_code')})
+                }
+            },
+            "metadata": {
+                "plan_type": "standards_register",
+                "category": "register",
+                "tags": ["standards", "register", "compliance", "references"],
+                "source_document_ids": source_document_ids,
+                # Documents whose extraction branch failed; the register is partial for these
+                "failed_document_ids": state.get("failed_document_ids") or [],
+            },
+            "document_number": None,
+        })
+    except Exception:
+        pass
+    return {"standards_from_project_documents": standards_list, "done": True, "error": error}
 
 builder = StateGraph(StandardsState, input=InputState, output=OutputState)
 builder.add_node("fetch_reference_database", fetch_reference_database_node)
-builder.add_node("extract_standards", extract_standards_node)
+builder.add_node("extract_document_standards", extract_document_standards_node)
+builder.add_node("merge_standards", merge_standards_node)
 builder.add_edge(START, "fetch_reference_database")
-builder.add_edge("fetch_reference_database", "extract_standards")
-builder.add_edge("extract_standards", END)
+builder.add_conditional_edges("fetch_reference_database", route_documents, ["extract_document_standards", "merge_standards"])
+builder.add_edge("extract_document_standards", "merge_standards")
+builder.add_edge("merge_standards", END)
 
 standards_extraction_graph = builder.compile()
 
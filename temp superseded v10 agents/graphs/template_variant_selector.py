@@ -1,22 +1,18 @@
-from typing import Dict, List, Any, Optional
+from typing import Dict, List, Any, Optional, Annotated, Tuple
+from typing_extensions import TypedDict
 from pydantic import BaseModel, Field
 from langgraph.graph import StateGraph, START, END
-from langchain_google_genai import ChatGoogleGenerativeAI
-import os
+from functools import lru_cache
+import asyncio
 import logging
 from agent.tools.action_graph_repo import upsertAssetsAndEdges, IdempotentAssetWriteSpec
+from agent.graphs.document_context import document_context
+from agent.graphs.llm_clients import gemini_pro, get_structured
 
 logger = logging.getLogger(__name__)
 
-# LLM Configuration following V9 patterns
-llm = ChatGoogleGenerativeAI(
-    model=os.getenv("GEMINI_MODEL_2", "gemini-2.5-pro"),
-    google_api_key=os.getenv("GOOGLE_API_KEY"),
-    temperature=0.1,
-    max_output_tokens=32768,
-    include_thoughts=False,
-    thinking_budget=-1,
-)
+# Shared client, see llm_clients
+llm = gemini_pro
 
 class TemplateSelection(BaseModel):
     """Pydantic model for template selection"""
@@ -27,58 +23,76 @@ class TemplateSelection(BaseModel):
     risk_considerations: List[str] = Field(description="Risk factors considered in template selection")
     confidence_score: float = Field(description="Confidence in template selection (0-1)")
 
-class TemplateVariant(BaseModel):
-    """Individual template variant"""
-    template_id: str = Field(description="Template identifier")
-    template_name: str = Field(description="Human-readable template name")
-    template_type: str = Field(description="Type of template (document, plan, checklist, etc.)")
-    applicability_score: float = Field(description="How well this template fits the project (0-1)")
-    selection_reason: str = Field(description="Why this template was selected")
-    customization_notes: List[str] = Field(description="Required customizations")
-
-class TemplateSelectorState(BaseModel):
+class TemplateVariant(TypedDict):
+    """Individual template variant, carried as a plain dict"""
+    template_id: Annotated[str, Field(description="Template identifier")]
+    template_name: Annotated[str, Field(description="Human-readable template name")]
+    template_type: Annotated[str, Field(description="Type of template (document, plan, checklist, etc.)")]
+    applicability_score: Annotated[float, Field(description="How well this template fits the project (0-1)")]
+    selection_reason: Annotated[str, Field(description="Why this template was selected")]
+    customization_notes: Annotated[List[str], Field(description="Required customizations")]
+
+class TemplateSelectionResponse(BaseModel):
+    """Structured LLM response for template selection"""
+    selections: List[TemplateVariant] = Field(description="Selected templates with details")
+    category: str = Field(description="Primary template category")
+    customizations: List[str] = Field(description="General customization requirements")
+    compliance_mapping: Dict[str, List[str]] = Field(description="Compliance to template mapping")
+    risk_factors: List[str] = Field(description="Risk factors considered")
+
+# Structured LLM bound once at import instead of per call
+_STRUCTURED_TEMPLATE_LLM = get_structured(llm, TemplateSelectionResponse)
+
+class TemplateSelectorState(TypedDict, total=False):
     """State for template selection following V9 patterns"""
     project_id: str
-    txt_project_documents: List[Dict[str, Any]] = []
-    project_details: Optional[Dict[str, Any]] = None
-    wbs_structure: Optional[Dict[str, Any]] = None
-    standards_from_project_documents: List[Dict[str, Any]] = []
-    template_selection: Optional[Dict[str, Any]] = None
-    asset_specs: List[Dict[str, Any]] = []
-    error: Optional[str] = None
-
-class InputState(BaseModel):
+    txt_project_documents: List[Dict[str, Any]]
+    combined_content: Optional[str]  # Preformatted document context, see document_context
+    project_details: Optional[Dict[str, Any]]
+    wbs_structure: Optional[Dict[str, Any]]
+    standards_from_project_documents: List[Dict[str, Any]]
+    template_selection: Optional[Dict[str, Any]]
+    asset_specs: List[Dict[str, Any]]
+    error: Optional[str]
+
+class InputState(TypedDict, total=False):
     """Input state for template selection"""
     project_id: str
-    txt_project_documents: List[Dict[str, Any]] = []
-    project_details: Optional[Dict[str, Any]] = None
-    wbs_structure: Optional[Dict[str, Any]] = None
-    standards_from_project_documents: List[Dict[str, Any]] = []
+    txt_project_documents: List[Dict[str, Any]]
+    combined_content: Optional[str]  # Preformatted document context, see document_context
+    project_details: Optional[Dict[str, Any]]
+    wbs_structure: Optional[Dict[str, Any]]
+    standards_from_project_documents: List[Dict[str, Any]]
 
-class OutputState(BaseModel):
+class OutputState(TypedDict, total=False):
     """Output state for template selection"""
-    template_selection: Optional[Dict[str, Any]] = None
-    asset_specs: List[Dict[str, Any]] = []
-    error: Optional[str] = None
+    template_selection: Optional[Dict[str, Any]]
+    asset_specs: List[Dict[str, Any]]
+    error: Optional[str]
+
+@lru_cache(maxsize=128)
+def _format_standards(standards: Tuple[Tuple[str, str], ...]) -> str:
+    # Keyed on (code, name) pairs since the standards dicts themselves aren't hashable
+    return "\n".join(f"- {code}: {name}" for code, name in standards)
+
+async def select_templates_node(state: TemplateSelectorState) -> Dict[str, Any]:
+    """Select appropriate templates using LLM analysis - NO REGEX, NO MOCK DATA
 
-def select_templates_node(state: TemplateSelectorState) -> TemplateSelectorState:
-    """Select appropriate templates using LLM analysis - NO REGEX, NO MOCK DATA"""
+    Returns only the keys this node sets; LangGraph merges them into the graph state.
+    """
 
     try:
-        docs = state.get("txt_project_documents", []) or []
-        project_details = state.get("project_details", {}) or {}
-        wbs = state.get("wbs_structure", {}) or {}
-        standards = state.get("standards_from_project_documents", []) or []
+        docs = state.get("txt_project_documents") or []
+        project_details = state.get("project_details") or {}
+        wbs = state.get("wbs_structure") or {}
+        standards = state.get("standards_from_project_documents") or []
 
-        combined_content = "\n\n".join([
-            f"Document: {d.get('file_name','Unknown')} (ID: {d.get('id','')})\n{d.get('content','')}"
-            for d in docs
-        ])
+        combined_content = document_context(docs, state.get("combined_content"))
+        doc_ids = [i for d in docs if (i := d.get('id'))]
 
-        standards_text = "\n".join([
-            f"- {s.get('standard_code', '')}: {s.get('spec_name', '')}"
-            for s in standards
-        ])
+        standards_text = _format_standards(
+            tuple((s.get('standard_code', ''), s.get('spec_name', '')) for s in standards)
+        )
 
         # LLM prompt for template selection
         template_prompt = f"""
@@ -138,30 +152,25 @@ def select_templates_node(state: TemplateSelectorState) -> TemplateSelectorState
         4. Required customizations
         """
 
-        # Get initial analysis
-        analysis_response = llm.invoke(template_prompt)
-
-        # Get structured template selection
-        class TemplateSelectionResponse(BaseModel):
-            selections: List[TemplateVariant] = Field(description="Selected templates with details")
-            category: str = Field(description="Primary template category")
-            customizations: List[str] = Field(description="General customization requirements")
-            compliance_mapping: Dict[str, List[str]] = Field(description="Compliance to template mapping")
-            risk_factors: List[str] = Field(description="Risk factors considered")
+        # Initial analysis and structured selection don't depend on each other; run them concurrently
+        analysis_response, template_result = await asyncio.gather(
+            llm.ainvoke(template_prompt),
+            _STRUCTURED_TEMPLATE_LLM.ainvoke(template_selection_prompt),
+        )
 
-        structured_llm = llm.with_structured_output(TemplateSelectionResponse)
-        template_result = structured_llm.invoke(template_selection_prompt)
+        # Selections are validated straight into TemplateVariant dicts
+        selected_templates = template_result.selections
 
         # Store LLM outputs for knowledge graph
         llm_outputs = {
             "template_selection": {
                 "analysis": analysis_response.content,
-                "selected_templates": [t.model_dump() for t in template_result.selections],
+                "selected_templates": selected_templates,
                 "category": template_result.category,
                 "customizations": template_result.customizations,
                 "compliance_mapping": template_result.compliance_mapping,
                 "risk_factors": template_result.risk_factors,
-                "input_documents": [d.get('id') for d in docs if d.get('id')],
+                "input_documents": doc_ids,
                 "timestamp": "2024-01-01T00:00:00Z"
             }
         }
@@ -171,8 +180,8 @@ def select_templates_node(state: TemplateSelectorState) -> TemplateSelectorState
             asset_type="analysis",
             asset_subtype="template_selection",
             name=f"Template Selection - {template_result.category}",
-            description=f"Template selection analysis for project {state.project_id}",
-            project_id=state.project_id,
+            description=f"Template selection analysis for project {state['project_id']}",
+            project_id=state["project_id"],
             metadata={
                 "analysis_type": "template_selection",
                 "template_category": template_result.category,
@@ -184,47 +193,38 @@ def select_templates_node(state: TemplateSelectorState) -> TemplateSelectorState
             },
             content={
                 "template_analysis": analysis_response.content,
-                "selected_templates": [t.model_dump() for t in template_result.selections],
-                "source_documents": [d.get('id') for d in docs if d.get('id')]
+                "selected_templates": selected_templates,
+                "source_documents": doc_ids
             },
-            idempotency_key=f"template_selection:{state.project_id}"
+            idempotency_key=f"template_selection:{state['project_id']}"
         )
 
         # Upsert to knowledge graph
-        upsert_result = upsertAssetsAndEdges([asset_spec])
-
-        return TemplateSelectorState(
-            project_id=state.project_id,
-            txt_project_documents=state.txt_project_documents,
-            project_details=state.get("project_details", {}),
-            wbs_structure=state.get("wbs_structure", {}),
-            standards_from_project_documents=state.get("standards_from_project_documents", []),
-            template_selection={
-                "selected_templates": [t.model_dump() for t in template_result.selections],
+        upsert_result = await asyncio.to_thread(upsertAssetsAndEdges, [asset_spec])
+
+        return {
+            "template_selection": {
+                "selected_templates": selected_templates,
                 "category": template_result.category,
                 "customizations": template_result.customizations,
                 "compliance_mapping": template_result.compliance_mapping,
                 "risk_factors": template_result.risk_factors
             },
-            asset_specs=[asset_spec.model_dump()],
-            error=None
-        )
+            "asset_specs": [asset_spec.model_dump()],
+            "error": None
+        }
 
     except Exception as e:
         logger.error(f"Template selection failed: {str(e)}")
-        return TemplateSelectorState(
-            project_id=state.project_id,
-            txt_project_documents=state.txt_project_documents,
-            project_details=state.get("project_details", {}),
-            wbs_structure=state.get("wbs_structure", {}),
-            standards_from_project_documents=state.get("standards_from_project_documents", []),
-            template_selection=None,
-            asset_specs=[],
-            error=f"Template selection failed: {str(e)}"
-        )
+        return {
+            "template_selection": None,
+            "asset_specs": [],
+            "error": f"Template selection failed: {str(e)}"
+        }
 
-def create_template_variant_selector_graph():
-    """Create the template variant selector graph with persistence"""
+@lru_cache(maxsize=None)
+def create_template_variant_selector_graph(checkpointer=True):
+    """Create the template variant selector graph with persistence (cached per checkpointer)"""
     workflow = StateGraph(TemplateSelectorState, input=InputState, output=OutputState)
 
     workflow.add_node("select_templates", select_templates_node)
@@ -232,4 +232,4 @@ def create_template_variant_selector_graph():
     workflow.add_edge(START, "select_templates")
     workflow.add_edge("select_templates", END)
 
-    return workflow.compile(checkpointer=True)
+    return workflow.compile(checkpointer=checkpointer)
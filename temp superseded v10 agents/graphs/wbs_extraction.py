@@ -1,98 +1,136 @@
-from typing import Dict, List, Any, Optional
+from typing import Dict, List, Any, Optional, Annotated
+from typing_extensions import TypedDict, Required
 from pydantic import BaseModel, Field
-from langchain_google_genai import ChatGoogleGenerativeAI
 from agent.tools.action_graph_repo import upsertAssetsAndEdges, IdempotentAssetWriteSpec
-import os
+from agent.graphs.document_context import document_context
+from agent.graphs.llm_cache import cached_invoke
+from agent.graphs.llm_clients import GEMINI_MODEL, gemini_flash, get_structured
+from functools import lru_cache
 import logging
-from agent.prompts.wbs_extraction_prompt import WBS_EXTRACTION_PROMPT
+from agent.prompts.wbs_extraction_prompt import WBS_EXTRACTION_INSTRUCTIONS, render_wbs_pqp_section
 
 logger = logging.getLogger(__name__)
 
-# LLM Configuration following V9 patterns
-llm = ChatGoogleGenerativeAI(
-    model=os.getenv("GEMINI_MODEL", "gemini-2.5-flash"),
-    google_api_key=os.getenv("GOOGLE_API_KEY"),
-    temperature=0.2,
-    max_output_tokens=65536,
-    include_thoughts=False,
-    thinking_budget=-1,
-)
-
-class WbsNode(BaseModel):
-    """Pydantic model for WBS nodes following V9 patterns"""
-    reasoning: Optional[str] = Field(default="", description="Brief reasoning")
-    id: str = Field(description="Temporary ID")
-    parentId: Optional[str] = Field(default=None)
-    node_type: str
-    name: str
-    source_reference_uuids: List[str] = Field(default_factory=list, description="List of document UUIDs")
-    source_reference_hints: List[str] = Field(default_factory=list, description="List of location hints")
-    source_reference_quotes: List[Optional[str]] = Field(default_factory=list, description="List of quoted sections")
-    description: str = Field(default="")
-    specification_reasoning: str = Field(default="")
-    applicable_specifications: List[str] = Field(default_factory=list)
-    applicable_specification_uuids: List[str] = Field(default_factory=list)
-    advisory_specifications: List[str] = Field(default_factory=list)
-    itp_reasoning: str = Field(default="")
-    itp_required: bool = Field(default=False)
-    specific_quality_requirements: List[str] = Field(default_factory=list)
-    is_leaf_node: bool = Field(default=False)
+# Shared client, see llm_clients; GEMINI_MODEL is the name it was built with
+llm = gemini_flash
+
+class WbsNode(TypedDict, total=False):
+    """WBS node carried as a plain dict; validated by pydantic as a field of the response model"""
+    reasoning: Annotated[Optional[str], Field(description="Brief reasoning")]
+    id: Required[Annotated[str, Field(description="Temporary ID")]]
+    parentId: Optional[str]
+    node_type: Required[str]
+    name: Required[str]
+    source_reference_uuids: Annotated[List[str], Field(description="List of document UUIDs")]
+    source_reference_hints: Annotated[List[str], Field(description="List of location hints")]
+    source_reference_quotes: Annotated[List[Optional[str]], Field(description="List of quoted sections")]
+    description: str
+    specification_reasoning: str
+    applicable_specifications: List[str]
+    applicable_specification_uuids: List[str]
+    advisory_specifications: List[str]
+    itp_reasoning: str
+    itp_required: bool
+    specific_quality_requirements: List[str]
+    is_leaf_node: bool
+
+# Values for optional WbsNode keys the LLM omits, so stored nodes keep the full key set
+_WBS_NODE_DEFAULTS: Dict[str, Any] = {
+    "reasoning": "",
+    "parentId": None,
+    "source_reference_uuids": [],
+    "source_reference_hints": [],
+    "source_reference_quotes": [],
+    "description": "",
+    "specification_reasoning": "",
+    "applicable_specifications": [],
+    "applicable_specification_uuids": [],
+    "advisory_specifications": [],
+    "itp_reasoning": "",
+    "itp_required": False,
+    "specific_quality_requirements": [],
+    "is_leaf_node": False,
+}
+
+def _with_defaults(node: WbsNode) -> Dict[str, Any]:
+    # Fresh lists per node so stored nodes never share the default containers
+    return {**{k: (list(v) if isinstance(v, list) else v) for k, v in _WBS_NODE_DEFAULTS.items()}, **node}
 
 class InitialWbsGenerationResponse(BaseModel):
     """Response model for initial WBS generation"""
     nodes: List[WbsNode]
 
-class WbsExtractionState(BaseModel):
+# Structured LLM bound once at import instead of per call
+_STRUCTURED_WBS_LLM = get_structured(llm, InitialWbsGenerationResponse, method="json_mode")
+
+class WbsExtractionState(TypedDict, total=False):
     """State following V9 TypedDict patterns"""
     project_id: str
-    txt_project_documents: List[Dict[str, Any]] = []
-    wbs_structure: Optional[Dict[str, Any]] = None
-    error: Optional[str] = None
+    txt_project_documents: List[Dict[str, Any]]
+    combined_content: Optional[str]  # Preformatted document context, see document_context
+    pqp_json: Optional[str]  # Project PQP as JSON, substituted into the prompt unmodified
+    wbs_structure: Optional[Dict[str, Any]]
+    error: Optional[str]
 
-class InputState(BaseModel):
+class InputState(TypedDict, total=False):
     """Input state for WBS extraction"""
     project_id: str
-    txt_project_documents: List[Dict[str, Any]] = []
+    txt_project_documents: List[Dict[str, Any]]
+    combined_content: Optional[str]  # Preformatted document context, see document_context
+    pqp_json: Optional[str]  # Project PQP as JSON, substituted into the prompt unmodified
 
-class OutputState(BaseModel):
+class OutputState(TypedDict, total=False):
     """Output state for WBS extraction"""
-    wbs_structure: Optional[Dict[str, Any]] = None
-    error: Optional[str] = None
+    wbs_structure: Optional[Dict[str, Any]]
+    error: Optional[str]
 
-def generate_wbs_structure_node(state: WbsExtractionState) -> WbsExtractionState:
+def generate_wbs_structure_node(state: WbsExtractionState) -> Dict[str, Any]:
     """Generate WBS structure using LLM following V9 patterns - NO REGEX, NO MOCK DATA"""
-    docs = state.txt_project_documents or []
-    combined_content = "\n\n".join([
-        f"Document: {d.get('file_name','Unknown')} (ID: {d.get('id','')})\n{d.get('content','')}" for d in docs
-    ])
+    docs = state.get("txt_project_documents") or []
+    combined_content = document_context(docs, state.get("combined_content"))
 
     # Fail fast: require non-empty documents and content
     if not docs or not combined_content.strip():
         raise ValueError("WBS extraction requires extracted document content; none available")
 
-    # Use extracted WBS prompt
-    prompt = WBS_EXTRACTION_PROMPT.format(combined_content=combined_content)
-
-    structured_llm = llm.with_structured_output(InitialWbsGenerationResponse, method="json_mode")
+    # Fixed instructions go as the system message; only the PQP and documents vary per project
+    prompt = (
+        f"{render_wbs_pqp_section(state.get('pqp_json') or 'No PQP provided')}"
+        f"\nPROJECT DOCUMENTS:\n{combined_content}"
+    )
 
     try:
-        response: InitialWbsGenerationResponse = structured_llm.invoke(prompt)
+        # Retries and repeat runs over the same PQP and documents reuse the cached structure
+        response: InitialWbsGenerationResponse = cached_invoke(
+            _STRUCTURED_WBS_LLM, prompt, InitialWbsGenerationResponse, GEMINI_MODEL,
+            system=WBS_EXTRACTION_INSTRUCTIONS,
+        )
+        nodes = [_with_defaults(node) for node in response.nodes] if response.nodes else []
 
         wbs_structure = {
-            "nodes": [node.model_dump() for node in response.nodes],
+            # Nodes are validated straight into dicts; no per-node model instances to dump
+            "nodes": nodes,
             "metadata": {
                 "extraction_method": "llm_structured_output",
-                "llm_model": os.getenv("GEMINI_MODEL", "gemini-2.5-flash"),
+                "llm_model": GEMINI_MODEL,
                 "source_documents_count": len(docs),
                 "extraction_timestamp": "2025-01-01T00:00:00.000Z"
             }
         }
 
+        # Tally node types and ITP flags in one pass over the nodes
+        sections = work_packages = itp_required_count = 0
+        for n in nodes:
+            node_type = n["node_type"]
+            sections += node_type == "section"
+            work_packages += node_type == "work_package"
+            itp_required_count += bool(n["itp_required"])
+
         # Store LLM outputs in content per knowledge graph
         llm_outputs = {
             "wbs": {
                 "extraction": {
-                    "model": os.getenv("GEMINI_MODEL", "gemini-2.5-flash"),
+                    "model": GEMINI_MODEL,
                     "timestamp": "2025-01-01T00:00:00.000Z",
                     "confidence": 0.85,
                     "method": "structured_output"
@@ -104,28 +142,25 @@ def generate_wbs_structure_node(state: WbsExtractionState) -> WbsExtractionState
                 },
                 "structure": {
                     "total_nodes": len(response.nodes),
-                    "sections": len([n for n in response.nodes if n.node_type == "section"]),
-                    "work_packages": len([n for n in response.nodes if n.node_type == "work_package"]),
-                    "itp_required_count": len([n for n in response.nodes if n.itp_required])
+                    "sections": sections,
+                    "work_packages": work_packages,
+                    "itp_required_count": itp_required_count
                 }
             }
         }
 
         wbs_structure["llm_outputs"] = llm_outputs
 
-        return WbsExtractionState(
-            project_id=state.project_id,
-            txt_project_documents=state.txt_project_documents,
-            wbs_structure=wbs_structure
-        )
+        return {"wbs_structure": wbs_structure}
 
     except Exception as e:
         logger.error(f"WBS extraction failed: {e}")
         raise ValueError(f"WBS extraction failed: {str(e)}")
 
 # Graph definition following V9 patterns
-def create_wbs_extraction_graph():
-    """Create the WBS extraction graph with persistence"""
+@lru_cache(maxsize=None)
+def create_wbs_extraction_graph(checkpointer=True):
+    """Create the WBS extraction graph with persistence (cached per checkpointer)"""
     from langgraph.graph import StateGraph, START, END
     # from langgraph.checkpoint.sqlite import SqliteSaver
 
@@ -144,30 +179,31 @@ def create_wbs_extraction_graph():
     graph.add_edge("create_asset_spec", "persist_assets")
     graph.add_edge("persist_assets", END)
 
-    return graph.compile(checkpointer=True)
+    return graph.compile(checkpointer=checkpointer)
 
 def create_wbs_asset_spec(state: WbsExtractionState) -> Dict[str, Any]:
     """Create asset write specification for WBS following knowledge graph"""
-    if not state.wbs_structure or not state.wbs_structure.get("nodes"):
+    wbs_structure = state.get("wbs_structure")
+    if not wbs_structure or not wbs_structure.get("nodes"):
         return {}
 
     spec = {
         "asset": {
             "type": "plan",
             "name": "Work Breakdown Structure",
-            "project_id": state.project_id,
+            "project_id": state["project_id"],
             "approval_state": "not_required",
             "classification": "internal",
-            "content": state.wbs_structure,
+            "content": wbs_structure,
             "metadata": {
                 "plan_type": "wbs",
                 "category": "planning",
                 "tags": ["wbs", "work_breakdown", "project_structure"],
-                "llm_outputs": state.wbs_structure.get("llm_outputs", {})
+                "llm_outputs": wbs_structure.get("llm_outputs", {})
             },
             "status": "draft"
         },
-        "idempotency_key": f"wbs:{state.project_id}",
+        "idempotency_key": f"wbs:{state['project_id']}",
         "edges": []
     }
 
@@ -175,7 +211,9 @@ def create_wbs_asset_spec(state: WbsExtractionState) -> Dict[str, Any]:
 
 def persist_wbs_to_database(state: WbsExtractionState) -> Dict[str, Any]:
     """Persist WBS asset specification to the knowledge graph database"""
-    if not state.wbs_structure:
+    # An empty extraction has no asset to write; skip building and validating a spec for it
+    wbs_structure = state.get("wbs_structure")
+    if not wbs_structure or not wbs_structure.get("nodes"):
         return {"persistence_result": {"success": True, "message": "No WBS to persist"}}
 
     try:
@@ -188,7 +226,7 @@ def persist_wbs_to_database(state: WbsExtractionState) -> Dict[str, Any]:
             asset_subtype="wbs",
             name=asset_spec["asset"]["name"],
             description="Extracted Work Breakdown Structure",
-            project_id=state.project_id,
+            project_id=state["project_id"],
             metadata=asset_spec["asset"]["metadata"],
             content=asset_spec["asset"]["content"],
             idempotency_key=asset_spec["idempotency_key"],
@@ -42,3 +42,15 @@ FILENAME: {file_name}
 CONTENT:
 {content}
 """
+
+# The template split once around its two placeholders, with the {{ }} escapes resolved, so each
+# document's prompt is a single join rather than a .format() scan over the whole template.
+_PRE, _rest = UNIFIED_DOCUMENT_METADATA_PROMPT.split("{file_name}")
+_MID, _POST = _rest.split("{content}")
+_PRE, _MID, _POST = (s.replace("{{", "{").replace("}}", "}") for s in (_PRE, _MID, _POST))
+del _rest
+
+
+def render_unified_prompt(file_name: str, content: str) -> str:
+    """Equivalent to UNIFIED_DOCUMENT_METADATA_PROMPT.format(file_name=..., content=...)."""
+    return f"{_PRE}{file_name}{_MID}{content}{_POST}"
@@ -42,4 +42,13 @@ For each item, provide:
 - Responsibility assignments
 - Hold/Witness point classifications
 
-Output the complete ITP structure as a structured JSON with an "items" array."""
\ No newline at end of file
+Output the complete ITP structure as a structured JSON with an "items" array."""
+# Split once around the two placeholders so each work package's prompt is a single join
+_PRE, _rest = ITP_GENERATION_PROMPT.split("{node_title}")
+_MID, _POST = _rest.split("{context_payload}")
+del _rest
+
+
+def render_itp_generation_prompt(node_title, context_payload) -> str:
+    """Equivalent to ITP_GENERATION_PROMPT.format(node_title=..., context_payload=...)."""
+    return f"{_PRE}{node_title}{_MID}{context_payload}{_POST}"
@@ -29,9 +29,73 @@ Source of truth pages referenced:
 
 Last generated: automated by assistant
 """
+import warnings
+from types import MappingProxyType
+
+# 8.1 operational procedures and templates all sit on the same page; they are listed as
+# (number suffix, title, description) rows and expanded by _op_docs in the node list below
+_OP_PAGE = "qse/corp-op-procedures-templates"
+
+_OP_PROCS = [
+    ("01", "Project Management Procedure",
+     "Defines phases and controls for planning, executing, monitoring and closing projects within the system."),
+    ("02", "Incident Reporting & Investigation Procedure",
+     "Reporting, investigation and corrective action workflow for incidents and nonconformities."),
+    ("03", "WHS Management Procedure",
+     "Overarching occupational health and safety operational controls and responsibilities."),
+    ("04", "Environmental Management Procedure",
+     "Operational controls for environmental aspects, mitigation measures and monitoring."),
+    ("05", "Construction & Operational Control Procedure",
+     "Work execution controls including lot management, inspections, hold points and verification."),
+    ("06", "Design & Development Control Procedure",
+     "Controls for review and approval of client-supplied designs and temporary works."),
+    ("07", "Procurement & Supplier Management Procedure",
+     "Supplier prequalification, purchasing controls and supplier performance monitoring."),
+]
+
+_OP_TEMPS = [
+    ("PQP", "Project Quality Plan (PQP) Template",
+     "Template for project-specific quality objectives, responsibilities, ITPs and verification records."),
+    ("EMP", "Environmental Management Plan (EMP) Template",
+     "Template for environmental aspects, controls, monitoring plans and incident response."),
+    ("OHSMP", "Occupational Health & Safety Management Plan (OHSMP) Template",
+     "Template for OHS risk controls, responsibilities and emergency preparedness."),
+    ("TMP", "Traffic Management Plan (TMP) Template",
+     "Template for planning temporary traffic arrangements and controls."),
+    ("SWMS", "Safe Work Method Statement (SWMS) Template",
+     "Template for task-level hazards, risk controls and verification sign-off."),
+    ("ITP", "Inspection & Test Plan (ITP) Template",
+     "Template defining inspection and testing checkpoints, hold/witness points and records."),
+    ("05", "Quality Inspection / ITP Record Template",
+     "Template for capturing inspection/test results against ITP checkpoints."),
+    ("04", "Site Induction & Training Record Template",
+     "Template for recording induction attendance and training completion."),
+    ("03", "Pre-start Meeting / Toolbox Talk Record Template",
+     "Template for recording pre-start/toolbox discussions and attendees."),
+    ("02", "Risk Assessment / SWMS Template",
+     "Template for structured risk assessment and SWMS content."),
+    ("01", "Project Emergency Preparedness & Response Plan Template",
+     "Template for emergency preparedness, response roles and communication protocols."),
+]
+
+
+def _op_docs(doc_type, code, rows):
+    return [
+        {
+            "id": f"doc:QSE-8.1-{code}-{suffix}",
+            "parent_id": _OP_PAGE,
+            "type": doc_type,
+            "document_number": f"QSE-8.1-{code}-{suffix}",
+            "title": title,
+            "path": f"/{_OP_PAGE}",
+            "description": description,
+        }
+        for suffix, title, description in rows
+    ]
+
 
 # Root node
-QSE_SYSTEM_NODES = [
+_QSE_SYSTEM_NODES_RAW = [
     {
         "id": "qse",
         "parent_id": None,
@@ -399,197 +463,9 @@ QSE_SYSTEM_NODES = [
         ),
     },
     # Procedures (8.1)
-    {
-        "id": "doc:QSE-8.1-PROC-01",
-        "parent_id": "qse/corp-op-procedures-templates",
-        "type": "procedure",
-        "document_number": "QSE-8.1-PROC-01",
-        "title": "Project Management Procedure",
-        "path": "/qse/corp-op-procedures-templates",
-        "description": (
-            "Defines phases and controls for planning, executing, monitoring and closing projects within the system."
-        ),
-    },
-    {
-        "id": "doc:QSE-8.1-PROC-02",
-        "parent_id": "qse/corp-op-procedures-templates",
-        "type": "procedure",
-        "document_number": "QSE-8.1-PROC-02",
-        "title": "Incident Reporting & Investigation Procedure",
-        "path": "/qse/corp-op-procedures-templates",
-        "description": (
-            "Reporting, investigation and corrective action workflow for incidents and nonconformities."
-        ),
-    },
-    {
-        "id": "doc:QSE-8.1-PROC-03",
-        "parent_id": "qse/corp-op-procedures-templates",
-        "type": "procedure",
-        "document_number": "QSE-8.1-PROC-03",
-        "title": "WHS Management Procedure",
-        "path": "/qse/corp-op-procedures-templates",
-        "description": (
-            "Overarching occupational health and safety operational controls and responsibilities."
-        ),
-    },
-    {
-        "id": "doc:QSE-8.1-PROC-04",
-        "parent_id": "qse/corp-op-procedures-templates",
-        "type": "procedure",
-        "document_number": "QSE-8.1-PROC-04",
-        "title": "Environmental Management Procedure",
-        "path": "/qse/corp-op-procedures-templates",
-        "description": (
-            "Operational controls for environmental aspects, mitigation measures and monitoring."
-        ),
-    },
-    {
-        "id": "doc:QSE-8.1-PROC-05",
-        "parent_id": "qse/corp-op-procedures-templates",
-        "type": "procedure",
-        "document_number": "QSE-8.1-PROC-05",
-        "title": "Construction & Operational Control Procedure",
-        "path": "/qse/corp-op-procedures-templates",
-        "description": (
-            "Work execution controls including lot management, inspections, hold points and verification."
-        ),
-    },
-    {
-        "id": "doc:QSE-8.1-PROC-06",
-        "parent_id": "qse/corp-op-procedures-templates",
-        "type": "procedure",
-        "document_number": "QSE-8.1-PROC-06",
-        "title": "Design & Development Control Procedure",
-        "path": "/qse/corp-op-procedures-templates",
-        "description": (
-            "Controls for review and approval of client-supplied designs and temporary works."
-        ),
-    },
-    {
-        "id": "doc:QSE-8.1-PROC-07",
-        "parent_id": "qse/corp-op-procedures-templates",
-        "type": "procedure",
-        "document_number": "QSE-8.1-PROC-07",
-        "title": "Procurement & Supplier Management Procedure",
-        "path": "/qse/corp-op-procedures-templates",
-        "description": (
-            "Supplier prequalification, purchasing controls and supplier performance monitoring."
-        ),
-    },
+    *_op_docs("procedure", "PROC", _OP_PROCS),
     # Templates (8.1)
-    {
-        "id": "doc:QSE-8.1-TEMP-PQP",
-        "parent_id": "qse/corp-op-procedures-templates",
-        "type": "template",
-        "document_number": "QSE-8.1-TEMP-PQP",
-        "title": "Project Quality Plan (PQP) Template",
-        "path": "/qse/corp-op-procedures-templates",
-        "description": (
-            "Template for project-specific quality objectives, responsibilities, ITPs and verification records."
-        ),
-    },
-    {
-        "id": "doc:QSE-8.1-TEMP-EMP",
-        "parent_id": "qse/corp-op-procedures-templates",
-        "type": "template",
-        "document_number": "QSE-8.1-TEMP-EMP",
-        "title": "Environmental Management Plan (EMP) Template",
-        "path": "/qse/corp-op-procedures-templates",
-        "description": (
-            "Template for environmental aspects, controls, monitoring plans and incident response."
-        ),
-    },
-    {
-        "id": "doc:QSE-8.1-TEMP-OHSMP",
-        "parent_id": "qse/corp-op-procedures-templates",
-        "type": "template",
-        "document_number": "QSE-8.1-TEMP-OHSMP",
-        "title": "Occupational Health & Safety Management Plan (OHSMP) Template",
-        "path": "/qse/corp-op-procedures-templates",
-        "description": (
-            "Template for OHS risk controls, responsibilities and emergency preparedness."
-        ),
-    },
-    {
-        "id": "doc:QSE-8.1-TEMP-TMP",
-        "parent_id": "qse/corp-op-procedures-templates",
-        "type": "template",
-        "document_number": "QSE-8.1-TEMP-TMP",
-        "title": "Traffic Management Plan (TMP) Template",
-        "path": "/qse/corp-op-procedures-templates",
-        "description": (
-            "Template for planning temporary traffic arrangements and controls."
-        ),
-    },
-    {
-        "id": "doc:QSE-8.1-TEMP-SWMS",
-        "parent_id": "qse/corp-op-procedures-templates",
-        "type": "template",
-        "document_number": "QSE-8.1-TEMP-SWMS",
-        "title": "Safe Work Method Statement (SWMS) Template",
-        "path": "/qse/corp-op-procedures-templates",
-        "description": (
-            "Template for task-level hazards, risk controls and verification sign-off."
-        ),
-    },
-    {
-        "id": "doc:QSE-8.1-TEMP-ITP",
-        "parent_id": "qse/corp-op-procedures-templates",
-        "type": "template",
-        "document_number": "QSE-8.1-TEMP-ITP",
-        "title": "Inspection & Test Plan (ITP) Template",
-        "path": "/qse/corp-op-procedures-templates",
-        "description": (
-            "Template defining inspection and testing checkpoints, hold/witness points and records."
-        ),
-    },
-    {
-        "id": "doc:QSE-8.1-TEMP-05",
-        "parent_id": "qse/corp-op-procedures-templates",
-        "type": "template",
-        "document_number": "QSE-8.1-TEMP-05",
-        "title": "Quality Inspection / ITP Record Template",
-        "path": "/qse/corp-op-procedures-templates",
-        "description": "Template for capturing inspection/test results against ITP checkpoints.",
-    },
-    {
-        "id": "doc:QSE-8.1-TEMP-04",
-        "parent_id": "qse/corp-op-procedures-templates",
-        "type": "template",
-        "document_number": "QSE-8.1-TEMP-04",
-        "title": "Site Induction & Training Record Template",
-        "path": "/qse/corp-op-procedures-templates",
-        "description": "Template for recording induction attendance and training completion.",
-    },
-    {
-        "id": "doc:QSE-8.1-TEMP-03",
-        "parent_id": "qse/corp-op-procedures-templates",
-        "type": "template",
-        "document_number": "QSE-8.1-TEMP-03",
-        "title": "Pre-start Meeting / Toolbox Talk Record Template",
-        "path": "/qse/corp-op-procedures-templates",
-        "description": "Template for recording pre-start/toolbox discussions and attendees.",
-    },
-    {
-        "id": "doc:QSE-8.1-TEMP-02",
-        "parent_id": "qse/corp-op-procedures-templates",
-        "type": "template",
-        "document_number": "QSE-8.1-TEMP-02",
-        "title": "Risk Assessment / SWMS Template",
-        "path": "/qse/corp-op-procedures-templates",
-        "description": "Template for structured risk assessment and SWMS content.",
-    },
-    {
-        "id": "doc:QSE-8.1-TEMP-01",
-        "parent_id": "qse/corp-op-procedures-templates",
-        "type": "template",
-        "document_number": "QSE-8.1-TEMP-01",
-        "title": "Project Emergency Preparedness & Response Plan Template",
-        "path": "/qse/corp-op-procedures-templates",
-        "description": (
-            "Template for emergency preparedness, response roles and communication protocols."
-        ),
-    },
+    *_op_docs("template", "TEMP", _OP_TEMPS),
 
     # 9.0 Performance Evaluation
     {
@@ -820,12 +696,106 @@ QSE_SYSTEM_NODES = [
 ]
 
 
+# Frozen as a tuple so importers share one catalogue; nodes stay plain dicts so the
+# list can still be passed straight to json.dumps for prompt grounding.
+QSE_SYSTEM_NODES = tuple(_QSE_SYSTEM_NODES_RAW)
+del _QSE_SYSTEM_NODES_RAW
+
+
 def index_nodes_by_id(nodes):
-    """Build a convenience index dict[id] -> node."""
+    """Build a convenience index dict[id] -> node.
+
+    Deprecated for the catalogue itself: use the prebuilt QSE_SYSTEM_INDEX_BY_ID.
+    """
+    warnings.warn(
+        "index_nodes_by_id is deprecated; use QSE_SYSTEM_INDEX_BY_ID",
+        DeprecationWarning,
+        stacklevel=2,
+    )
     return {n["id"]: n for n in nodes}
 
 
-QSE_SYSTEM_INDEX_BY_ID = index_nodes_by_id(QSE_SYSTEM_NODES)
+def _index_children(nodes):
+    children = {}
+    for n in nodes:
+        children.setdefault(n["parent_id"], []).append(n["id"])
+    return {parent: tuple(ids) for parent, ids in children.items()}
+
+
+def _index_positions(nodes, key):
+    positions = {}
+    for i, n in enumerate(nodes):
+        positions.setdefault(n[key], []).append(i)
+    return {value: tuple(idx) for value, idx in positions.items()}
+
+
+# Read-only view so importers can't add or drop entries from the shared index
+QSE_SYSTEM_INDEX_BY_ID = MappingProxyType({n["id"]: n for n in QSE_SYSTEM_NODES})
+QSE_CHILDREN_BY_PARENT = _index_children(QSE_SYSTEM_NODES)
+# type/path -> positions in QSE_SYSTEM_NODES
+QSE_BY_TYPE = _index_positions(QSE_SYSTEM_NODES, "type")
+QSE_BY_PATH = _index_positions(QSE_SYSTEM_NODES, "path")
+# Controlled document number ("QSE-8.1-PROC-05") -> node, for document nodes only
+QSE_BY_DOC_NUMBER = {n["document_number"]: n for n in QSE_SYSTEM_NODES if n.get("document_number")}
+
+
+def resolve_doc(document_number):
+    """Return the node for a document number as written by an LLM, or None if it isn't catalogued."""
+    return QSE_BY_DOC_NUMBER.get((document_number or "").strip().upper())
+
+
+def find(type=None, path=None):
+    """Return the nodes matching every given filter, in catalogue order."""
+    selected = None
+    for index, value in ((QSE_BY_TYPE, type), (QSE_BY_PATH, path)):
+        if value is None:
+            continue
+        hits = set(index.get(value, ()))
+        selected = hits if selected is None else selected & hits
+    if selected is None:
+        return list(QSE_SYSTEM_NODES)
+    return [QSE_SYSTEM_NODES[i] for i in sorted(selected)]
+
+
+def _materialized_paths(nodes, index):
+    paths = {}
+
+    def _mat(node_id):
+        if node_id not in paths:
+            parent_id = index[node_id]["parent_id"]
+            paths[node_id] = (_mat(parent_id) if parent_id in index else "/") + node_id + "/"
+        return paths[node_id]
+
+    for n in nodes:
+        _mat(n["id"])
+    return paths
+
+
+# id -> "/qse/qse/corp-context/doc:QSE-4.1-PROC-01/"; kept beside the nodes rather than in
+# them so the adjacency list sent to the LLM doesn't grow
+QSE_MAT_PATH_BY_ID = _materialized_paths(QSE_SYSTEM_NODES, QSE_SYSTEM_INDEX_BY_ID)
+
+
+def subtree(root_id):
+    """Return root_id's node and every node below it, in catalogue order."""
+    prefix = QSE_MAT_PATH_BY_ID[root_id]
+    return [n for n in QSE_SYSTEM_NODES if QSE_MAT_PATH_BY_ID[n["id"]].startswith(prefix)]
+
+
+def children_of(node_id):
+    """Return the ids of the direct children of node_id (None for the root's parent)."""
+    return QSE_CHILDREN_BY_PARENT.get(node_id, ())
+
+
+def descendants_of(node_id):
+    """Return the ids of every node below node_id, depth-first in catalogue order."""
+    out = []
+    stack = list(reversed(children_of(node_id)))
+    while stack:
+        child = stack.pop()
+        out.append(child)
+        stack.extend(reversed(children_of(child)))
+    return out
 
 # Export the narrative summary (module docstring) for LLM grounding
 QSE_SYSTEM_SUMMARY = (__doc__ or "").strip()
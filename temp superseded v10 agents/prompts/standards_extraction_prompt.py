@@ -4,7 +4,7 @@ You are a technical standards expert analyzing construction project documents to
 REFERENCE DATABASE (Complete list of available standards):
 {reference_db_text}
 
-TASK: Extract ALL technical standard codes mentioned in the project document below and match them against the reference database.
+TASK: Extract ALL technical standard codes mentioned in the project documents below and match them against the reference database.
 
 STANDARD FORMATS TO LOOK FOR:
 - Australian Standards: AS 1234, AS/NZS 5678, AS 1234.1-2020
@@ -25,14 +25,25 @@ EXTRACTION AND MATCHING RULES:
 6. Be flexible with matching - handle variations in formatting, spacing, and case
 7. Focus on standards that are actually referenced for compliance or specification purposes
 8. Include complete metadata for each standard found
+9. Each document starts with a "Document: <file name> (ID: <id>)" header; list a standard once and set document_ids to the IDs of every document that references it
 
 MATCHING EXAMPLES:
 - Document mentions "AS 1234" → Look for "AS 1234" or similar in database Spec ID
 - Document mentions "ASTM C123-18" → Look for "ASTM C123" or similar in database Spec ID
 - Document mentions "MRTS04" → Look for "MRTS04" or "MRTS 04" in database Spec ID
 
-PROJECT DOCUMENT:
+PROJECT DOCUMENTS:
 {document_content}
 
-Analyze the document thoroughly and provide a structured response with all standards found, whether they match the database or not.
+Analyze the documents thoroughly and provide a structured response with all standards found, whether they match the database or not.
 """
+
+# Split once around its two slots so each batch's prompt is a single join, not a .format() scan
+_PRE, _rest = STANDARDS_EXTRACTION_PROMPT.split("{reference_db_text}")
+_MID, _POST = _rest.split("{document_content}")
+del _rest
+
+
+def render_standards_extraction_prompt(reference_db_text: str, document_content: str) -> str:
+    """Equivalent to STANDARDS_EXTRACTION_PROMPT.format(reference_db_text=..., document_content=...)."""
+    return f"{_PRE}{reference_db_text}{_MID}{document_content}{_POST}"
@@ -30,11 +30,8 @@ DEFINITION AND ROLE OF WBS IN CONSTRUCTION PROJECT PLANNING (Essential Context -
 
 - **Foundational Role in Project Integration:** A well-designed WBS is crucial for project success. It prevents scope creep, improves communication, provides a basis for responsibility assignment, and enables accurate planning and control. It acts as the central organizing structure linking scope with schedule, costs, resources, risks, and procurement.
 
-PROJECT PQP (Authoritative, Unmodified JSON):
-{pqp_json}
-
 MANDATORY ALIGNMENT WITH PQP ITPs (Keep it simple):
-- The PQP may declare a list of ITPs (by code/title) for the project.
+- The PQP (provided at the end of this prompt) may declare a list of ITPs (by code/title) for the project.
 - Your WBS MUST include work packages that naturally accommodate every PQP-declared ITP.
 - Use the PQP ITP list as a strong guide for the main scope structure and work package naming.
 - Prefer practical, field-usable grouping that maps cleanly to those ITPs.
@@ -175,7 +172,28 @@ OUTPUT REQUIREMENTS:
 - Focus on creating a logical, complete WBS that captures 100% of the project scope
 - Only output the core structural fields: `reasoning`, `id`, `parentId`, `node_type`, `name`, and `source_references`. Additional fields will be populated in subsequent processing steps.
 - DO NOT generate actual UUIDs - use only the semantic path-based temporary IDs
+
+PROJECT PQP (Authoritative, Unmodified JSON):
+{pqp_json}
 """
 
 # Keep the original variable name for compatibility
 WBS_EXTRACTION_PROMPT = INITIAL_STRUCTURE_GENERATION_PROMPT
+
+# The PQP section is last, so everything before it is fixed instruction text: sent as its own
+# system message it is an identical prefix on every call, which provider prompt caches reuse.
+# Split once with the {{ }} escapes resolved, so rendering is a join rather than a .format() pass.
+_PQP_HEADER = "PROJECT PQP (Authoritative, Unmodified JSON):\n"
+_instructions, _PQP_TAIL = INITIAL_STRUCTURE_GENERATION_PROMPT.split(_PQP_HEADER + "{pqp_json}")
+WBS_EXTRACTION_INSTRUCTIONS = _instructions.replace("{{", "{").replace("}}", "}")
+del _instructions
+
+
+def render_wbs_pqp_section(pqp_json: str) -> str:
+    """The variable tail of the prompt: the PQP section that follows WBS_EXTRACTION_INSTRUCTIONS."""
+    return f"{_PQP_HEADER}{pqp_json}{_PQP_TAIL}"
+
+
+def render_wbs_extraction_prompt(pqp_json: str) -> str:
+    """Equivalent to INITIAL_STRUCTURE_GENERATION_PROMPT.format(pqp_json=pqp_json)."""
+    return f"{WBS_EXTRACTION_INSTRUCTIONS}{render_wbs_pqp_section(pqp_json)}"